@@ -1,6 +1,8 @@
 from flask_restx import Api
 from .lcm_instances import api as ns1
 from .location import api as ns2
+from .nest_catalogue import api as ns3
+from .app_quota import api as ns4
 
 api = Api(
     title='Application-Aware Network Slice Manager',
@@ -10,3 +12,5 @@ api = Api(
 
 api.add_namespace(ns1)
 api.add_namespace(ns2)
+api.add_namespace(ns3)
+api.add_namespace(ns4)
@@ -0,0 +1,30 @@
+from flask_restx import Namespace, Resource, fields
+from core import app_quota_manager
+
+api = Namespace('app_quota', description='Application-Aware NSM K8s quota allocation APIs')
+
+# ServiceAccount Token Wait Statistics Model Specification
+
+token_wait_stats = api.model('token_wait_stats', {
+    'count': fields.Integer(description='ServiceAccount tokens waited for'),
+    'timeouts': fields.Integer(description='ServiceAccount tokens not ready before the token timeout'),
+    'total': fields.Float(description='Total seconds waited for ServiceAccount tokens'),
+    'max': fields.Float(description='Longest wait for a ServiceAccount token, in seconds'),
+    'last': fields.Float(description='Last wait for a ServiceAccount token, in seconds')
+})
+
+# Error Message Model Specification
+
+error_msg = api.model('error_msg', {'message': fields.String(required=True)})
+
+
+@api.route('/token_wait')
+class TokenWaitStatsCtrl(Resource):
+
+    @api.doc('Get the statistics of the waits for the tokens of the created ServiceAccounts.')
+    @api.marshal_with(token_wait_stats)
+    @api.response(200, 'ServiceAccount token wait statistics')
+    @api.response(401, 'Unauthorized', model=error_msg)
+    @api.response(403, 'Forbidden', model=error_msg)
+    def get(self):
+        return app_quota_manager.get_token_wait_stats()
@@ -1,15 +1,18 @@
-from flask_restx import Namespace, Resource, fields
+from flask_restx import Namespace, Resource, fields, marshal
 from flask import request, abort
 from core import app_quota_manager
 from core import exceptions
 from core import db_manager
-from core.enums import InstantiationStatus, NsiNotificationType, NsiStatus
+from core.enums import InstantiationStatus, NsiNotificationType, NsiStatus, SliceType
 from core import intent_translation_manager
 from core import nsmf_manager
 from core import vao_manager
+from apis import streaming
 from marshmallow import Schema
 from threading import Thread
+from urllib.parse import urlencode
 import marshmallow.fields
+import marshmallow.validate
 
 api = Namespace('lcm/instances', description='Application-Aware NSM LCM APIs')
 
@@ -130,6 +133,34 @@ vas_info = api.model('vas_info', {
     'nestId': fields.String(required=True)
 }, strict=True)
 
+# NEST Candidate Model Specification
+
+nest_candidate = api.model('nest_candidate', {
+    'nestId': fields.String(required=True),
+    'score': fields.Float(required=True, description='Closeness of fit, 1 for an exact fit'),
+    'sliceType': fields.String(enum=['EMBB', 'URLLC', 'MMTC'], required=True),
+    'isolationLevel': fields.String(required=True),
+    'minDelay': fields.Integer,
+    'maximumDL': fields.Float,
+    'maxUplinkThroughput': fields.Float
+}, strict=True)
+
+# Intent Translation Model Specification
+
+area_quota = api.model('area_quota', {
+    'geographicalAreaId': fields.String(required=True),
+    'cpu': fields.String(required=True),
+    'ram': fields.String(required=True),
+    'storage': fields.String(required=True)
+}, strict=True)
+
+translation = api.model('translation', {
+    'nestId': fields.String,
+    'quotas': fields.Nested(area_quota, as_list=True,
+                            description='Quotas aggregated by Geographical Area', skip_none=True),
+    'errors': fields.List(fields.String, required=True, description='Intent Translation Errors')
+}, strict=True)
+
 # Error Message Model Specification
 
 error_msg = api.model('error_msg', {'message': fields.String(required=True)})
@@ -153,56 +184,95 @@ class VASPostSchema(Schema):
 vas_post_schema = VASPostSchema()
 
 
+class VASGetSchema(Schema):
+    limit = marshmallow.fields.Int(validate=marshmallow.validate.Range(min=1, max=1000))
+    after = marshmallow.fields.UUID()
+    status = marshmallow.fields.Str(validate=marshmallow.validate.OneOf([e.name for e in InstantiationStatus]))
+    nest_id = marshmallow.fields.Str()
+    network_slice_id = marshmallow.fields.UUID()
+    geographical_area_id = marshmallow.fields.UUID()
+    slice_type = marshmallow.fields.Str(validate=marshmallow.validate.OneOf([e.name for e in SliceType]))
+    stream = marshmallow.fields.Str(validate=marshmallow.validate.OneOf([streaming.JSON, streaming.NDJSON]))
+
+
+vas_get_schema = VASGetSchema()
+
+
+class NestCandidatesSchema(Schema):
+    k = marshmallow.fields.Int(validate=marshmallow.validate.Range(min=1, max=100))
+
+
+nest_candidates_schema = NestCandidatesSchema()
+
+
 @api.route('/')
 class VASCtrl(Resource):
 
     @api.doc('Get the list of Vertical Application Slice Instances.')
-    @api.marshal_list_with(vas_info, skip_none=True)
-    @api.response(200, 'Vertical Application Slice Instances')
+    @api.param('limit', 'Maximum number of Vertical Application Slice Instances to return (1-1000), '
+                        'not allowed when streaming', type=int)
+    @api.param('after', 'Return the Vertical Application Slice Instances following this VASI')
+    @api.param('status', 'Filter by Vertical Application Slice Status',
+               enum=['INSTANTIATING', 'INSTANTIATED', 'FAILED', 'TERMINATING', 'TERMINATED'])
+    @api.param('nest_id', 'Filter by NEST Identifier')
+    @api.param('network_slice_id', 'Filter by 5G Network Slice Identifier')
+    @api.param('geographical_area_id', 'Filter by Geographical Area Identifier referenced in the intent')
+    @api.param('slice_type', 'Filter by Slice Type requested in the intent', enum=['EMBB', 'URLLC', 'MMTC'])
+    @api.param('stream', 'Stream the Vertical Application Slice Instances as a chunked JSON array (json) or as '
+                         'newline delimited JSON (ndjson), also selected by Accept: application/x-ndjson',
+               enum=[streaming.JSON, streaming.NDJSON])
+    @api.response(200, 'Vertical Application Slice Instances, the next page (if any) is linked in the Link header',
+                  [vas_info])
+    @api.response(400, 'Bad Request', model=error_msg)
     @api.response(401, 'Unauthorized', model=error_msg)
     @api.response(403, 'Forbidden', model=error_msg)
     @api.response(500, 'Internal Server Error', model=error_msg)
     def get(self):
-        # Get all Vertical Application Slice Status
-        _vas_status = None
-        try:
-            _vas_status = db_manager.get_va_status()
-        except exceptions.DBException as e:
-            abort(500, str(e))
+        # Validate request parameters
+        errors = vas_get_schema.validate(request.args)
+        if errors:
+            abort(400, str(errors))
+        params = vas_get_schema.load(request.args)
+        limit = params.get('limit')
+        filters = {
+            'limit': limit,
+            'after': str(params['after']) if 'after' in params else None,
+            'status': params.get('status'),
+            'nest_id': params.get('nest_id'),
+            'network_slice_id': str(params['network_slice_id']) if 'network_slice_id' in params else None,
+            'geographical_area_id': str(params['geographical_area_id']) if 'geographical_area_id' in params else None,
+            'slice_type': params.get('slice_type')
+        }
 
-        # Build the info model for each Vertical Application Slice Status
-        # retrieving the correspondent Network Slice Status and Vertical
-        # Application Quota Status
-        _vas_info = []
-        for status in _vas_status:
-            vasi = status[0]
-            _network_slice_status = None
-            _va_quota_status = None
+        # Stream the Vertical Application Slices read from a server-side cursor if requested. The Link header
+        # of the next page would be known only after the body is sent, so streamed requests cannot be paged
+        stream_format = streaming.get_stream_format()
+        if stream_format is not None:
+            if limit is not None:
+                abort(400, 'limit cannot be used when streaming, use after to resume a stream.')
+            rows = None
             try:
-                ns_id = status[2]
-                if ns_id is not None:
-                    _network_slice_status = db_manager.get_network_slice_status_by_id(ns_id)
-                else:
-                    _network_slice_status = (None, None)
-                _va_quota_status = db_manager.get_va_quota_status_by_vas_id(vasi)
-            except (exceptions.DBException, exceptions.NotExistingEntityException) as e:
+                rows = streaming.start_stream(db_manager.stream_va_info(**filters))
+            except exceptions.DBException as e:
                 abort(500, str(e))
+            return streaming.stream_response(rows, vas_info, stream_format)
 
-            _vas_info.append({
-                'vasStatus': {
-                    'vasi': vasi,
-                    'status': status[1]
-                },
-                'vaQuotaInfo': [quota[1] for quota in _va_quota_status],
-                'networkSliceStatus': {
-                    'networkSliceId': _network_slice_status[0],
-                    'status': _network_slice_status[1]
-                },
-                'vasConfiguration': status[3],
-                'nestId': status[4]
-            })
+        # Get the info model of the Vertical Application Slices matching the filters, each
+        # one already joined with its Network Slice Status and Vertical Application Quota Status
+        _vas_info = None
+        try:
+            _vas_info = db_manager.get_va_info(**filters)
+        except exceptions.DBException as e:
+            abort(500, str(e))
 
-        return _vas_info
+        # A full page may be followed by other entries: link the page starting after its last VASI
+        headers = {}
+        if limit is not None and len(_vas_info) == limit:
+            args = request.args.to_dict()
+            args['after'] = _vas_info[-1]['vasStatus']['vasi']
+            headers['Link'] = '<' + request.base_url + '?' + urlencode(args) + '>; rel="next"'
+
+        return marshal(_vas_info, vas_info, skip_none=True), 200, headers
 
     @api.doc('Request Vertical Application Slice Instantiation.')
     @api.expect(intent, validate=True)
@@ -219,6 +289,15 @@ class VASCtrl(Resource):
 
         vas_intent = request.json
 
+        # Store the geographicalAreaIds in canonical UUID form, as matched by the intent filters of GET. The ones
+        # that are not UUIDs are kept and fail the quota allocation
+        for location_constraint in vas_intent['locationConstraints']:
+            try:
+                location_constraint['geographicalAreaId'] = \
+                    app_quota_manager.get_canonical_area_id(location_constraint.get('geographicalAreaId'))
+            except exceptions.MalformedIntentException:
+                pass
+
         # Create entry for vertical application slice
         vertical_application_slice_id = None
         try:
@@ -228,27 +307,54 @@ class VASCtrl(Resource):
         except exceptions.DBException as e:
             abort(500, str(e))
 
+        # Retrieve the most appropriate NEST for the instantiation of the 5G Network Slice, before allocating
+        # the quotas: no quota is allocated for an intent that cannot be translated, and the NEST is recorded
+        # in the same transaction as the quotas
+        nest_id = None
+        try:
+            nest_id = intent_translation_manager.select_nest(vas_intent['networkingConstraints'])
+        # Abort if Intent mapping fail
+        except exceptions.FailedIntentTranslationException as e:
+            try:
+                db_manager.update_va_with_status(vertical_application_slice_id, InstantiationStatus.FAILED.name)
+            # Abort if DB entry cannot be updated
+            except exceptions.DBException:
+                pass
+            finally:
+                abort(500, str(e))
+        # Abort if NEST cannot be selected due to condition not implemented
+        except exceptions.NotImplementedException as e:
+            try:
+                db_manager.update_va_with_status(vertical_application_slice_id, InstantiationStatus.FAILED.name)
+            # Abort if DB entry cannot be updated
+            except exceptions.DBException as ee:
+                abort(500, str(ee))
+            abort(501, str(e))
+        # Abort if Networking Constraints do not specify URLLC or EMBB NEST
+        except exceptions.MalformedIntentException as e:
+            try:
+                db_manager.update_va_with_status(vertical_application_slice_id, InstantiationStatus.FAILED.name)
+            # Abort if DB entry cannot be updated
+            except exceptions.DBException as ee:
+                abort(500, str(ee))
+            abort(400, str(e))
+
         # Allocate K8s quota for each compute constraint
         k8s_configs = None
         try:
             k8s_configs = app_quota_manager.allocate_quotas(vas_intent['locationConstraints'],
                                                             vas_intent['computingConstraints'])
         # Abort if quota cannot be allocated
-        except (exceptions.MissingContextException, exceptions.QuantitiesMalformedException) as e:
+        except (exceptions.MissingContextException, exceptions.QuantitiesMalformedException,
+                exceptions.NotExistingEntityException, exceptions.MalformedIntentException) as e:
             try:
                 db_manager.update_va_with_status(vertical_application_slice_id, InstantiationStatus.FAILED.name)
             # Abort if DB entry cannot be updated
             except exceptions.DBException as e2:
                 abort(500, str(e2))
             abort(400, str(e))
-
-        # Create DB entry for each allocated quota binding them to the
-        # vertical_application_slice_id previously generated
-        try:
-            for k8s_config in k8s_configs:
-                db_manager.insert_va_quota_status(k8s_config, vertical_application_slice_id)
-        # Abort if DB entry cannot be created
-        except exceptions.DBException as e:
+        # Abort if the token of a ServiceAccount was not ready in time or the locations cannot be loaded
+        except (exceptions.ServiceAccountSecretException, exceptions.DBException) as e:
             try:
                 db_manager.update_va_with_status(vertical_application_slice_id, InstantiationStatus.FAILED.name)
             # Abort if DB entry cannot be updated
@@ -257,13 +363,16 @@ class VASCtrl(Resource):
             finally:
                 abort(500, str(e))
 
-        # Retrieve the most appropriate NEST for the instantiation of the 5G Network Slice
-        nest_id = None
+        # Create DB entry for each allocated quota binding them to the vertical_application_slice_id
+        # previously generated, and record the selected NEST, all in one transaction
         try:
-            nest_id = intent_translation_manager.select_nest(vas_intent['networkingConstraints'])
-            db_manager.update_va_status_with_nest_id(vertical_application_slice_id, nest_id)
-        # Abort if Intent mapping fail or DB entry cannot be created
-        except (exceptions.FailedIntentTranslationException, exceptions.DBException) as e:
+            with db_manager.transaction():
+                for k8s_config in k8s_configs:
+                    db_manager.insert_va_quota_status(k8s_config, vertical_application_slice_id)
+                db_manager.update_va_status_with_nest_id(vertical_application_slice_id, nest_id)
+        # Abort if DB entry cannot be created, releasing the quotas that were not recorded
+        except exceptions.DBException as e:
+            app_quota_manager.rollback_quotas(k8s_configs)
             try:
                 db_manager.update_va_with_status(vertical_application_slice_id, InstantiationStatus.FAILED.name)
             # Abort if DB entry cannot be updated
@@ -271,22 +380,6 @@ class VASCtrl(Resource):
                 pass
             finally:
                 abort(500, str(e))
-        # Abort if NEST cannot be selected due to condition not implemented
-        except exceptions.NotImplementedException as e:
-            try:
-                db_manager.update_va_with_status(vertical_application_slice_id, InstantiationStatus.FAILED.name)
-            # Abort if DB entry cannot be updated
-            except exceptions.DBException as ee:
-                abort(500, str(ee))
-            abort(501, str(e))
-        # Abort if Networking Constraints do not specify URLLC or EMBB NEST
-        except exceptions.MalformedIntentException as e:
-            try:
-                db_manager.update_va_with_status(vertical_application_slice_id, InstantiationStatus.FAILED.name)
-            # Abort if DB entry cannot be updated
-            except exceptions.DBException as ee:
-                abort(500, str(ee))
-            abort(400, str(e))
 
         ns_id = None
         try:
@@ -305,8 +398,9 @@ class VASCtrl(Resource):
                 abort(500, str(e))
 
         try:
-            db_manager.insert_network_slice_status(ns_id, InstantiationStatus.INSTANTIATING.name)
-            db_manager.update_va_status_with_ns(vertical_application_slice_id, ns_id)
+            with db_manager.transaction():
+                db_manager.insert_network_slice_status(ns_id, InstantiationStatus.INSTANTIATING.name)
+                db_manager.update_va_status_with_ns(vertical_application_slice_id, ns_id)
         # Abort if DB entries cannot be created and/or updated
         except exceptions.DBException as e:
             try:
@@ -320,6 +414,112 @@ class VASCtrl(Resource):
         return vertical_application_slice_id
 
 
+@api.route('/nest_candidates')
+class NestCandidatesCtrl(Resource):
+
+    @api.doc('Rank the NESTs satisfying the Networking Constraints, without instantiating anything.')
+    @api.param('k', 'Maximum number of NEST candidates to return (1-100, default 5)', type=int)
+    @api.expect([networking_constraint], validate=True)
+    @api.response(200, 'NEST candidates, best fit first', [nest_candidate])
+    @api.response(400, 'Bad Request', model=error_msg)
+    @api.response(401, 'Unauthorized', model=error_msg)
+    @api.response(403, 'Forbidden', model=error_msg)
+    @api.response(500, 'Internal Server Error', model=error_msg)
+    @api.response(501, 'Not Implemented', model=error_msg)
+    def post(self):
+        # Validate request parameters
+        errors = nest_candidates_schema.validate(request.args)
+        if errors:
+            abort(400, str(errors))
+        k = nest_candidates_schema.load(request.args).get('k', 5)
+        # The validation of the expected list also accepts a single Networking Constraint
+        if not isinstance(request.json, list):
+            abort(400, 'A list of Networking Constraints is expected.')
+
+        candidates = None
+        try:
+            candidates = intent_translation_manager.get_nest_candidates(request.json, k)
+        # Abort if the NEST Catalogue cannot be retrieved
+        except exceptions.FailedIntentTranslationException as e:
+            abort(500, str(e))
+        # Abort if NESTs cannot be ranked due to condition not implemented
+        except exceptions.NotImplementedException as e:
+            abort(501, str(e))
+        # Abort if Networking Constraints do not specify URLLC or EMBB NEST
+        except exceptions.MalformedIntentException as e:
+            abort(400, str(e))
+
+        return marshal(candidates, nest_candidate, skip_none=True)
+
+
+@api.route('/translate')
+class VASTranslationCtrl(Resource):
+
+    @api.doc('Dry run the translation of a batch of intents, without allocating or instantiating anything.')
+    @api.expect([intent], validate=True)
+    @api.response(200, 'Selected NEST, aggregated quotas and errors of each intent, in request order', [translation])
+    @api.response(400, 'Bad Request', model=error_msg)
+    @api.response(401, 'Unauthorized', model=error_msg)
+    @api.response(403, 'Forbidden', model=error_msg)
+    @api.response(500, 'Internal Server Error', model=error_msg)
+    def post(self):
+        vas_intents = request.json
+        # The validation of the expected list also accepts a single intent
+        if not isinstance(vas_intents, list):
+            abort(400, 'A list of intents is expected.')
+
+        # Select all the NESTs from the same selection index, fetching the NEST Catalogue at most once
+        nest_index = None
+        try:
+            nest_index = intent_translation_manager.get_nest_index()
+        except exceptions.FailedIntentTranslationException as e:
+            abort(500, str(e))
+
+        translations = []
+        for vas_intent in vas_intents:
+            _translation = {'errors': []}
+            try:
+                _translation['nestId'] = intent_translation_manager.select_nest(vas_intent['networkingConstraints'],
+                                                                                nest_index)
+            except (exceptions.FailedIntentTranslationException, exceptions.NotImplementedException,
+                    exceptions.MalformedIntentException) as e:
+                _translation['errors'].append(str(e))
+
+            try:
+                _translation['quotas'] = app_quota_manager.build_quotas(vas_intent['locationConstraints'],
+                                                                        vas_intent['computingConstraints'])
+            except (exceptions.QuantitiesMalformedException, exceptions.MalformedIntentException) as e:
+                _translation['errors'].append(str(e))
+
+            translations.append(_translation)
+
+        # Look up the locations referenced by the whole batch at once, with the same
+        # canonical geographical area IDs and existence check of the instantiation
+        geographical_area_ids = set()
+        for _translation in translations:
+            geographical_area_ids.update(_translation.get('quotas', {}).keys())
+
+        locations = None
+        try:
+            locations = app_quota_manager.get_quota_locations(geographical_area_ids)
+        except exceptions.DBException as e:
+            abort(500, str(e))
+
+        for _translation in translations:
+            quotas = _translation.get('quotas')
+            if quotas is None:
+                continue
+
+            try:
+                app_quota_manager.check_quota_locations(quotas.keys(), locations)
+            except exceptions.NotExistingEntityException as e:
+                _translation['errors'].append(str(e))
+            _translation['quotas'] = [dict(quota, geographicalAreaId=geographical_area_id)
+                                      for geographical_area_id, quota in quotas.items()]
+
+        return marshal(translations, translation, skip_none=True)
+
+
 @api.route('/network_slice/status_update')
 class NetworkSliceStatusUpdateHandler(Resource):
 
@@ -341,8 +541,9 @@ class NetworkSliceStatusUpdateHandler(Resource):
         # Abort if notification type is 'ERROR'
         if nsi_notification_type == NsiNotificationType.ERROR.name:
             try:
-                db_manager.update_network_slice_status(ns_id, InstantiationStatus.FAILED.name)
-                db_manager.update_va_with_status_by_network_slice(ns_id, InstantiationStatus.FAILED.name)
+                with db_manager.transaction():
+                    db_manager.update_network_slice_status(ns_id, InstantiationStatus.FAILED.name)
+                    db_manager.update_va_with_status_by_network_slice(ns_id, InstantiationStatus.FAILED.name)
 
                 thread = Thread(target=vao_manager.notify, kwargs={'ns_id': ns_id})
                 thread.start()
@@ -366,8 +567,9 @@ class NetworkSliceStatusUpdateHandler(Resource):
             # Abort if the Network Slice instantiation failed
             elif nsi_status == NsiStatus.FAILED.name:
                 try:
-                    db_manager.update_network_slice_status(ns_id, InstantiationStatus.FAILED.name)
-                    db_manager.update_va_with_status_by_network_slice(ns_id, InstantiationStatus.FAILED.name)
+                    with db_manager.transaction():
+                        db_manager.update_network_slice_status(ns_id, InstantiationStatus.FAILED.name)
+                        db_manager.update_va_with_status_by_network_slice(ns_id, InstantiationStatus.FAILED.name)
 
                     thread = Thread(target=vao_manager.notify, kwargs={'ns_id': ns_id})
                     thread.start()
@@ -399,8 +601,9 @@ class NetworkSliceStatusUpdateHandler(Resource):
             # Update the Network Slice status and the VAS status if the notification is INSTANTIATED or TERMINATED
             elif nsi_status == NsiStatus.INSTANTIATED.name:
                 try:
-                    db_manager.update_network_slice_status(ns_id, InstantiationStatus[nsi_status].name)
-                    db_manager.update_va_with_status_by_network_slice(ns_id, InstantiationStatus[nsi_status].name)
+                    with db_manager.transaction():
+                        db_manager.update_network_slice_status(ns_id, InstantiationStatus[nsi_status].name)
+                        db_manager.update_va_with_status_by_network_slice(ns_id, InstantiationStatus[nsi_status].name)
 
                     thread = Thread(target=vao_manager.notify, kwargs={'ns_id': ns_id})
                     thread.start()
@@ -423,8 +626,9 @@ class NetworkSliceStatusUpdateHandler(Resource):
                     abort(500, str(e))
             elif nsi_status == NsiStatus.TERMINATED.name:
                 try:
-                    db_manager.update_network_slice_status(ns_id, InstantiationStatus[nsi_status].name)
-                    db_manager.update_va_with_status_by_network_slice(ns_id, InstantiationStatus[nsi_status].name)
+                    with db_manager.transaction():
+                        db_manager.update_network_slice_status(ns_id, InstantiationStatus[nsi_status].name)
+                        db_manager.update_va_with_status_by_network_slice(ns_id, InstantiationStatus[nsi_status].name)
                     return '', 200
                 except exceptions.DBException as e:
                     abort(500, str(e))
@@ -444,46 +648,17 @@ class VASCtrlByID(Resource):
     @api.response(404, 'Not Found', model=error_msg)
     @api.response(500, 'Internal Server Error', model=error_msg)
     def get(self, vasi):
-        # Get Vertical Application Slice Status by VASI
+        # Get the info model of the Vertical Application Slice by VASI, already
+        # joined with its Network Slice Status and Vertical Application Quota Status
         vasi = str(vasi)
-        _vas_status = None
+        _vas_info = None
         try:
-            _vas_status = db_manager.get_va_status_by_id(vasi)
+            _vas_info = db_manager.get_va_info_by_id(vasi)
         except exceptions.NotExistingEntityException as e:
             abort(404, str(e))
         except exceptions.DBException as e:
             abort(500, str(e))
 
-        # Build the info model for the Vertical Application Slice Status
-        # retrieving the correspondent Network Slice Status and Vertical
-        # Application Quota Status
-        _vas_info = None
-        _network_slice_status = None
-        _va_quota_status = None
-        try:
-            ns_id = _vas_status[2]
-            if ns_id is not None:
-                _network_slice_status = db_manager.get_network_slice_status_by_id(ns_id)
-            else:
-                _network_slice_status = (None, None)
-            _va_quota_status = db_manager.get_va_quota_status_by_vas_id(vasi)
-        except (exceptions.DBException, exceptions.NotExistingEntityException) as e:
-            abort(500, str(e))
-
-        _vas_info = {
-            'vasStatus': {
-                'vasi': vasi,
-                'status': _vas_status[1]
-            },
-            'vaQuotaInfo': [quota[1] for quota in _va_quota_status],
-            'networkSliceStatus': {
-                'networkSliceId': _network_slice_status[0],
-                'status': _network_slice_status[1]
-            },
-            'vasConfiguration': _vas_status[3],
-            'nestId': _vas_status[4]
-        }
-
         return _vas_info
 
     @api.doc('Delete a Vertical Application Slice by ID.')
@@ -1,7 +1,12 @@
-from flask_restx import Namespace, Resource, fields
+from flask_restx import Namespace, Resource, fields, marshal
 from flask import request, abort
 from core import db_manager
 from core import exceptions
+from apis import streaming
+from marshmallow import Schema
+import marshmallow.fields
+import marshmallow.validate
+from collections import Counter
 
 api = Namespace('location', description='Application-Aware NSM Location APIs')
 
@@ -39,50 +44,65 @@ geographical_area = api.model('geographical_area', {
 error_msg = api.model('error_msg', {'message': fields.String(required=True)})
 
 
+class LocationGetSchema(Schema):
+    stream = marshmallow.fields.Str(validate=marshmallow.validate.OneOf([streaming.JSON, streaming.NDJSON]))
+    label = marshmallow.fields.Str(validate=marshmallow.validate.Regexp(r'^[^=,]+=[^=,]*(,[^=,]+=[^=,]*)*$'))
+
+
+def parse_label_selector(label_selector: str) -> dict:
+    # Parse a key1=value1,key2=value2 label selector into a labels dict
+    labels = {}
+    for label in label_selector.split(','):
+        key, value = label.split('=', 1)
+        labels[key.strip()] = value.strip()
+
+    return labels
+
+
+location_get_schema = LocationGetSchema()
+
+
 @api.route('/')
 class LocationCtrl(Resource):
 
     @api.doc('Get the list of Geographical Locations.')
-    @api.marshal_list_with(geographical_area)
-    @api.response(200, 'Geographical Locations')
+    @api.param('stream', 'Stream the Geographical Locations as a chunked JSON array (json) or as '
+                         'newline delimited JSON (ndjson), also selected by Accept: application/x-ndjson',
+               enum=[streaming.JSON, streaming.NDJSON])
+    @api.param('label', 'Filter by cluster node labels, as key1=value1,key2=value2: only the Geographical '
+                        'Locations whose cluster has a node with all the given labels are returned')
+    @api.response(200, 'Geographical Locations', [geographical_area])
+    @api.response(400, 'Bad Request', model=error_msg)
     @api.response(401, 'Unauthorized', model=error_msg)
     @api.response(403, 'Forbidden', model=error_msg)
     @api.response(500, 'Internal Server Error', model=error_msg)
     def get(self):
-        # Get all locations
-        locations = None
-        try:
-            locations = db_manager.get_locations()
-        except exceptions.DBException as e:
-            abort(500, str(e))
-
-        _location = []
-        for location in locations:
-            cluster_id = location[2]
-            _cluster = None
-            _nodes = None
-
+        # Validate request parameters
+        errors = location_get_schema.validate(request.args)
+        if errors:
+            abort(400, str(errors))
+        node_labels = None
+        if 'label' in request.args:
+            node_labels = parse_label_selector(request.args['label'])
+
+        # Stream the locations read from a server-side cursor if requested
+        stream_format = streaming.get_stream_format()
+        if stream_format is not None:
+            rows = None
             try:
-                _cluster = db_manager.get_cluster_by_id(cluster_id)
-                _nodes = db_manager.get_cluster_nodes_by_cluster_id(cluster_id)
+                rows = streaming.start_stream(db_manager.stream_location_info(node_labels=node_labels))
             except exceptions.DBException as e:
                 abort(500, str(e))
+            return streaming.stream_response(rows, geographical_area, stream_format)
 
-            _location.append({
-                'geographicalAreaId': location[0],
-                'locationName': location[1],
-                'cluster': {
-                    'name': _cluster[1],
-                    'type': _cluster[2],
-                    'nodes': [{'name': n[1], 'labels': n[2]} for n in _nodes]
-                },
-                'latitude': location[3],
-                'longitude': location[4],
-                'coverageRadius': location[5],
-                'segment': location[6]
-            })
-
-        return _location
+        # Get the locations, each one already joined with its cluster and cluster nodes
+        _location = None
+        try:
+            _location = db_manager.get_location_info(node_labels=node_labels)
+        except exceptions.DBException as e:
+            abort(500, str(e))
+
+        return marshal(_location, geographical_area)
 
     @api.doc('Create Geographical Locations Area.')
     @api.expect(geographical_area, validate=True)
@@ -91,30 +111,45 @@ class LocationCtrl(Resource):
     @api.response(403, 'Forbidden', model=error_msg)
     @api.response(500, 'Internal Server Error', model=error_msg)
     def post(self):
-        # Create location
+        # Create location, its cluster and all the cluster nodes in one transaction
         location = request.json
 
-        _cluster = location['cluster']
-        cluster_id = None
+        geographical_area_id = None
         try:
-            cluster_id = db_manager.insert_cluster(_cluster)
+            with db_manager.transaction():
+                cluster_id = db_manager.insert_cluster(location['cluster'])
+                db_manager.insert_cluster_nodes(location['cluster']['nodes'], cluster_id)
+                geographical_area_id = db_manager.insert_location(location, cluster_id)
         except exceptions.DBException as e:
             abort(500, str(e))
 
-        nodes = location['cluster']['nodes']
-        for _node in nodes:
-            try:
-                db_manager.insert_cluster_node(_node, cluster_id)
-            except exceptions.DBException as e:
-                abort(500, str(e))
+        return geographical_area_id
 
-        geographical_area_id = None
+
+@api.route('/batch')
+class LocationBatchCtrl(Resource):
+
+    @api.doc('Create multiple Geographical Locations Areas.')
+    @api.expect([geographical_area], validate=True)
+    @api.response(200, 'Geographical Area Ids, in the same order of the request', [fields.String])
+    @api.response(400, 'Bad Request', model=error_msg)
+    @api.response(401, 'Unauthorized', model=error_msg)
+    @api.response(403, 'Forbidden', model=error_msg)
+    @api.response(500, 'Internal Server Error', model=error_msg)
+    def post(self):
+        # Create all the locations with their clusters and cluster nodes in one transaction
+        locations = request.json
+        # The validation of the expected list also accepts a single location
+        if not isinstance(locations, list):
+            abort(400, 'A list of Geographical Areas is expected.')
+
+        geographical_area_ids = None
         try:
-            geographical_area_id = db_manager.insert_location(location, cluster_id)
+            geographical_area_ids = db_manager.insert_locations(locations)
         except exceptions.DBException as e:
             abort(500, str(e))
 
-        return geographical_area_id
+        return geographical_area_ids
 
 
 @api.route('/<uuid:geographical_area_id>')
@@ -124,40 +159,54 @@ class LocationCtrlById(Resource):
     @api.doc('Update a Geographical Location by Id')
     @api.expect(geographical_area, validate=True)
     @api.response(204, 'Geographical Area Id')
+    @api.response(400, 'Bad Request', model=error_msg)
     @api.response(401, 'Unauthorized', model=error_msg)
     @api.response(403, 'Forbidden', model=error_msg)
+    @api.response(404, 'Not Found', model=error_msg)
     @api.response(500, 'Internal Server Error', model=error_msg)
     def patch(self, geographical_area_id):
-        # Delete a Geographical Area Location
-        try:
-            location = db_manager.get_location_by_id(str(geographical_area_id))
-
-            cluster_id = location[2]
-            db_manager.delete_cluster_node_by_cluster_id(cluster_id)
-            db_manager.delete_cluster(cluster_id)
-            db_manager.delete_location(str(geographical_area_id))
-        except exceptions.DBException as e:
-            abort(500, str(e))
-
-        # Create location
+        # Update a Geographical Area Location in place, applying to its cluster and cluster
+        # nodes only the changes with respect to the stored ones, in one transaction
+        geographical_area_id = str(geographical_area_id)
         location = request.json
-
         _cluster = location['cluster']
-        cluster_id = None
-        try:
-            cluster_id = db_manager.insert_cluster(_cluster)
-        except exceptions.DBException as e:
-            abort(500, str(e))
 
-        nodes = location['cluster']['nodes']
-        for _node in nodes:
-            try:
-                db_manager.insert_cluster_node(_node, cluster_id)
-            except exceptions.DBException as e:
-                abort(500, str(e))
+        # The nodes are matched by name, so the names must be unique
+        duplicates = sorted(name for name, count in Counter(_node['name'] for _node in _cluster['nodes']).items()
+                            if count > 1)
+        if len(duplicates) > 0:
+            abort(400, 'Duplicate cluster node name(s) ' + ', '.join(duplicates) + '.')
 
         try:
-            db_manager.insert_location(location, cluster_id)
+            with db_manager.transaction():
+                cluster_id = db_manager.get_location_by_id(geographical_area_id)[2]
+                db_manager.update_location(geographical_area_id, location)
+
+                current_cluster = db_manager.get_cluster_by_id(cluster_id)
+                if current_cluster[1] != _cluster['name'] or current_cluster[2] != _cluster['type']:
+                    db_manager.update_cluster(cluster_id, _cluster)
+
+                # Match the nodes by name: update the ones whose labels changed,
+                # create the new ones and remove the ones no longer listed
+                nodes = {}
+                for _node in _cluster['nodes']:
+                    nodes[_node['name']] = _node
+
+                matched = set()
+                for current_node in db_manager.get_cluster_nodes_by_cluster_id(cluster_id):
+                    cluster_node_id, name, labels = current_node[0], current_node[1], current_node[2]
+                    if name not in nodes or name in matched:
+                        db_manager.delete_cluster_node(cluster_node_id)
+                        continue
+
+                    matched.add(name)
+                    if labels != nodes[name]['labels']:
+                        db_manager.update_cluster_node(cluster_node_id, nodes[name])
+
+                db_manager.insert_cluster_nodes([_node for name, _node in nodes.items() if name not in matched],
+                                                cluster_id)
+        except exceptions.NotExistingEntityException as e:
+            abort(404, str(e))
         except exceptions.DBException as e:
             abort(500, str(e))
 
@@ -0,0 +1,47 @@
+from flask_restx import Namespace, Resource, fields
+from core import nest_catalogue_manager
+
+api = Namespace('nest_catalogue', description='Application-Aware NSM NEST Catalogue cache APIs')
+
+# NEST Catalogue Cache Statistics Model Specification
+
+cache_stats = api.model('cache_stats', {
+    'hits': fields.Integer(description='Requests served by the fresh cached catalogue'),
+    'staleHits': fields.Integer(description='Requests served by the stale cached catalogue while revalidating'),
+    'misses': fields.Integer(description='Requests that had to wait for a catalogue fetch'),
+    'notModified': fields.Integer(description='Revalidations answered with 304 Not Modified'),
+    'unchanged': fields.Integer(description='Fetches returning a payload identical to the cached one'),
+    'errors': fields.Integer(description='Failed catalogue fetches'),
+    'prefetching': fields.Boolean(description='Whether the catalogue is refreshed by the background prefetcher'),
+    'lastRefresh': fields.DateTime(description='Time of the last successful background refresh'),
+    'rebuildDuration': fields.Float(description='Seconds spent rebuilding the NEST selection index '
+                                                'for the last catalogue change'),
+    'version': fields.Integer(description='Version of the cached catalogue, increased at every change'),
+    'size': fields.Integer(description='Number of NESTs in the cached catalogue'),
+    'age': fields.Float(description='Seconds since the cached catalogue was last fetched or revalidated')
+})
+
+# Error Message Model Specification
+
+error_msg = api.model('error_msg', {'message': fields.String(required=True)})
+
+
+@api.route('/cache')
+class NestCatalogueCacheCtrl(Resource):
+
+    @api.doc('Get the NEST Catalogue cache statistics.')
+    @api.marshal_with(cache_stats)
+    @api.response(200, 'NEST Catalogue cache statistics')
+    @api.response(401, 'Unauthorized', model=error_msg)
+    @api.response(403, 'Forbidden', model=error_msg)
+    def get(self):
+        return nest_catalogue_manager.get_stats()
+
+    @api.doc('Invalidate the NEST Catalogue cache.')
+    @api.response(204, 'NEST Catalogue cache invalidated')
+    @api.response(401, 'Unauthorized', model=error_msg)
+    @api.response(403, 'Forbidden', model=error_msg)
+    def delete(self):
+        nest_catalogue_manager.invalidate()
+
+        return '', 204
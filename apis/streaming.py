@@ -0,0 +1,58 @@
+from flask import request, Response, stream_with_context
+from flask_restx import marshal
+from typing import Iterator
+import json
+
+JSON = 'json'
+NDJSON = 'ndjson'
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def get_stream_format():
+    # Return the streaming format requested with the 'stream' query parameter or,
+    # if missing, with an NDJSON Accept header. None if the client did not ask for streaming
+    stream = request.args.get('stream')
+    if stream is not None:
+        return stream
+    if request.accept_mimetypes.best == NDJSON_MIMETYPE:
+        return NDJSON
+
+    return None
+
+
+def start_stream(rows: Iterator) -> Iterator:
+    # Read the first row, i.e. run the query and fetch the first batch, before the status and the headers are sent:
+    # an error at this point can still be reported with an error status, while later errors only truncate the body
+    empty = object()
+    first = next(rows, empty)
+
+    def resume():
+        if first is not empty:
+            yield first
+        yield from rows
+
+    return resume()
+
+
+def stream_response(rows, model, stream_format: str) -> Response:
+    # Marshal and send each row as soon as it is read, either as the items of a
+    # chunked JSON array or as newline delimited JSON, never holding the whole list.
+    # The rows are expected from start_stream
+    def generate_json():
+        yield '['
+        first = True
+        for row in rows:
+            if not first:
+                yield ','
+            first = False
+            yield json.dumps(marshal(row, model, skip_none=True))
+        yield ']\n'
+
+    def generate_ndjson():
+        for row in rows:
+            yield json.dumps(marshal(row, model, skip_none=True)) + '\n'
+
+    if stream_format == NDJSON:
+        return Response(stream_with_context(generate_ndjson()), mimetype=NDJSON_MIMETYPE)
+
+    return Response(stream_with_context(generate_json()), mimetype='application/json')
@@ -0,0 +1,181 @@
+#
+# Compare the NEST selection engines on synthetic catalogues of 100, 10k and 100k templates:
+#  - python: the pure-Python path, mapping and filtering the whole catalogue at every selection
+#  - index:  NestIndex, bisect over the per <Slice Type, isolation level> sorted buckets
+#  - numpy:  ColumnarNests, boolean masks over NumPy arrays (skipped if numpy is not installed)
+#
+# The QI table is loaded from config.ini as the application does, run from the repository root:
+#   python3 -m benchmarks.nest_selection
+#
+from core import qi
+from core.enums import SliceType
+from core.intent_translation_manager import map_nests_to_slice_type
+from core.nest_index import NestIndex
+from core.nest_columnar import ColumnarNests, numpy
+from typing import List, Tuple
+import random
+import time
+
+sizes = [100, 10000, 100000]
+isolation_levels = ['NoIsolation', 'Logical', 'Physical']
+queries_count = 50
+
+
+def build_catalogue(size: int, rnd: random.Random) -> list:
+    qis = list(qi.keys())
+    return [{
+        'gst': {
+            'gstId': str(i),
+            'sliceType': rnd.choice(['EMBB', 'MMTC', None]),
+            'sliceQoSparams': [{'qosIndicator': rnd.choice(qis)} for _ in range(rnd.randint(1, 3))],
+            'isolation': {'isolationLevel': rnd.choice(isolation_levels)},
+            'downlinkThroughputNS': {'maximumDL': str(rnd.randint(1, 10000))},
+            'uplinkThroughputNS': {'maxUplinkThroughput': str(rnd.randint(1, 5000))}
+        }
+    } for i in range(size)]
+
+
+def build_queries(rnd: random.Random) -> list:
+    # <Slice Type, isolation level, max delay, min DL throughput, min UL throughput>
+    queries = []
+    for _ in range(queries_count):
+        slice_type = rnd.choice([SliceType.URLLC, SliceType.EMBB, SliceType.MMTC])
+        if slice_type == SliceType.URLLC:
+            queries.append((slice_type, rnd.choice(isolation_levels), rnd.choice([5, 10, 50, 100]), None, None))
+        else:
+            queries.append((slice_type, rnd.choice(isolation_levels), None,
+                            rnd.randint(1, 10000), rnd.randint(1, 5000)))
+    return queries
+
+
+# Filter the <NEST, Slice Type> list received as input in a <NEST, Slice Type> list
+# containing only NEST with the specified Slice Type
+def filter_nest_slice_type_map(nest_slice_type_map: List[Tuple[dict, SliceType, int]],
+                               slice_type: SliceType) -> List[Tuple[dict, SliceType, int]]:
+    return [nest_slice_type for nest_slice_type in nest_slice_type_map if nest_slice_type[1].name == slice_type.name]
+
+
+def filter_by_isolation_level(nest_slice_type_map: List[Tuple[dict, SliceType, int]],
+                              isolation_level: str) -> List[Tuple[dict, SliceType, int]]:
+    _nest_slice_type_map = []
+    for nest_slice_type in nest_slice_type_map:
+        gst = nest_slice_type[0].get('gst')
+        if gst is None:
+            continue
+
+        isolation = gst.get('isolation')
+        if isolation is None:
+            continue
+
+        _isolation_level = isolation.get('isolationLevel')
+        if _isolation_level is None:
+            continue
+
+        if isolation_level == _isolation_level:
+            _nest_slice_type_map.append(nest_slice_type)
+
+    return _nest_slice_type_map
+
+
+def filter_by_dl_throughput(nest_slice_type_map: List[Tuple[dict, SliceType, int]],
+                            dl_throughput: float) -> List[Tuple[dict, SliceType, int]]:
+    _nest_slice_type_map = []
+    for nest_slice_type in nest_slice_type_map:
+        gst = nest_slice_type[0].get('gst')
+        if gst is None:
+            continue
+
+        downlink_throughput_ns = gst.get('downlinkThroughputNS')
+        if downlink_throughput_ns is None:
+            continue
+
+        maximum_dl = downlink_throughput_ns.get('maximumDL')
+        if maximum_dl is None:
+            continue
+
+        maximum_dl = float(maximum_dl)
+        if maximum_dl >= dl_throughput:
+            _nest_slice_type_map.append(nest_slice_type)
+
+    return _nest_slice_type_map
+
+
+def filter_by_ul_throughput(nest_slice_type_map: List[Tuple[dict, SliceType, int]],
+                            ul_throughput: float) -> List[Tuple[dict, SliceType, int]]:
+    _nest_slice_type_map = []
+    for nest_slice_type in nest_slice_type_map:
+        gst = nest_slice_type[0].get('gst')
+        if gst is None:
+            continue
+
+        uplink_throughput_ns = gst.get('uplinkThroughputNS')
+        if uplink_throughput_ns is None:
+            continue
+
+        max_uplink_throughput = uplink_throughput_ns.get('maxUplinkThroughput')
+        if max_uplink_throughput is None:
+            continue
+
+        max_uplink_throughput = float(max_uplink_throughput)
+        if max_uplink_throughput >= ul_throughput:
+            _nest_slice_type_map.append(nest_slice_type)
+
+    return _nest_slice_type_map
+
+
+def select_python(nests: list, query: tuple):
+    slice_type, isolation_level, max_delay, min_dl_throughput, min_ul_throughput = query
+    nest_slice_type_map = filter_nest_slice_type_map(map_nests_to_slice_type(nests), slice_type)
+    if max_delay is not None:
+        nest_slice_type_map = [n for n in nest_slice_type_map if float(n[2]) <= max_delay]
+    nest_slice_type_map = filter_by_isolation_level(nest_slice_type_map, isolation_level)
+    if min_dl_throughput is not None:
+        nest_slice_type_map = filter_by_dl_throughput(nest_slice_type_map, min_dl_throughput)
+    if min_ul_throughput is not None:
+        nest_slice_type_map = filter_by_ul_throughput(nest_slice_type_map, min_ul_throughput)
+    return nest_slice_type_map[0][0] if len(nest_slice_type_map) > 0 else None
+
+
+def select_engine(engine, query: tuple):
+    candidates = engine.select(*query)
+    return candidates[0].nest if len(candidates) > 0 else None
+
+
+def measure(function, queries: list) -> float:
+    # Mean milliseconds per call
+    start = time.perf_counter()
+    for query in queries:
+        function(query)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main():
+    rnd = random.Random(42)
+    print('%8s  %-7s  %12s  %14s' % ('NESTs', 'engine', 'build [ms]', 'select [ms]'))
+    for size in sizes:
+        nests = build_catalogue(size, rnd)
+        queries = build_queries(rnd)
+
+        # The pure-Python path is slow on large catalogues, time it on fewer queries
+        python_queries = queries[:max(1, queries_count * 100 // size)]
+        print('%8d  %-7s  %12s  %14.4f' % (size, 'python', '-',
+                                            measure(lambda q: select_python(nests, q), python_queries)))
+
+        engines = [('index', NestIndex)]
+        if numpy is not None:
+            engines.append(('numpy', ColumnarNests))
+        for name, engine_class in engines:
+            start = time.perf_counter()
+            engine = engine_class(0, map_nests_to_slice_type(nests))
+            build = (time.perf_counter() - start) * 1000
+
+            # Every engine must select the same NEST as the pure-Python path
+            for query in python_queries:
+                assert select_engine(engine, query) is select_python(nests, query)
+
+            print('%8d  %-7s  %12.1f  %14.4f' % (size, name, build,
+                                                  measure(lambda q: select_engine(engine, q), queries)))
+
+
+if __name__ == '__main__':
+    main()
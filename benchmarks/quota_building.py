@@ -0,0 +1,74 @@
+#
+# Compare the quota building of intents with many application components spread over many areas:
+#  - scan:  the previous approach, scanning all the computing constraints for every located component
+#  - index: build_quotas, component -> parsed constraint index and a single aggregation pass
+#
+# app_quota_manager is imported as the application does, run from the repository root:
+#   python3 -m benchmarks.quota_building
+#
+from core.app_quota_manager import build_quotas, parse_computing_constraint, aggregate_quotas, format_quota
+import random
+import time
+
+# <application components, geographical areas>
+intents = [(10, 2), (100, 5), (500, 20), (2000, 50)]
+repetitions = 5
+
+
+def build_intent(components_count: int, areas_count: int, rnd: random.Random) -> tuple:
+    areas = ['area-' + str(i) for i in range(areas_count)]
+    location_constraints = []
+    computing_constraints = []
+    for i in range(components_count):
+        component = 'component-' + str(i)
+        location_constraints.append({'geographicalAreaId': rnd.choice(areas), 'applicationComponentId': component})
+        computing_constraints.append({
+            'applicationComponentId': component,
+            'cpu': rnd.choice(['100m', '250m', '500m', '1', '2']),
+            'ram': rnd.choice(['128Mi', '256Mi', '512Mi', '1Gi', '2Gi']),
+            'storage': rnd.choice(['1Gi', '5Gi', '10Gi', '500M'])
+        })
+    rnd.shuffle(computing_constraints)
+
+    return location_constraints, computing_constraints
+
+
+def build_quotas_scan(location_constraints: list, computing_constraints: list) -> dict:
+    components_location_map = {}
+    for loc in location_constraints:
+        components_location_map.setdefault(loc['geographicalAreaId'], []).append(loc['applicationComponentId'])
+
+    quotas = {}
+    for geographicalAreaId, components in components_location_map.items():
+        quota = None
+        for component in components:
+            quota = aggregate_quotas(quota, parse_computing_constraint(
+                [cc for cc in computing_constraints if cc['applicationComponentId'] == component][0]))
+        quotas[geographicalAreaId] = format_quota(quota)
+
+    return quotas
+
+
+def measure(function, intent: tuple) -> float:
+    # Mean milliseconds per call
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        function(*intent)
+    return (time.perf_counter() - start) * 1000 / repetitions
+
+
+def main():
+    rnd = random.Random(42)
+    print('%10s  %6s  %-6s  %12s' % ('components', 'areas', 'build', 'time [ms]'))
+    for components_count, areas_count in intents:
+        intent = build_intent(components_count, areas_count, rnd)
+
+        # Both approaches must build the same quotas
+        assert build_quotas(*intent) == build_quotas_scan(*intent)
+
+        for name, function in [('scan', build_quotas_scan), ('index', build_quotas)]:
+            print('%10d  %6d  %-6s  %12.3f' % (components_count, areas_count, name, measure(function, intent)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,9 @@
 from configparser import ConfigParser
 from pathlib import Path
-from json import loads
 import logging
-import psycopg2
+import re
+import socket
+from core.qi_table import compile_qi
 
 # Configure logging
 logging.basicConfig(
@@ -16,10 +17,14 @@ quota_log = logging.getLogger('app-quota-manager')
 db_log = logging.getLogger('db-manager')
 nsmf_log = logging.getLogger('nsmf-manager')
 vao_log = logging.getLogger('vao-manager')
+migration_log = logging.getLogger('migration-manager')
+catalogue_log = logging.getLogger('nest-catalogue-manager')
+qi_log = logging.getLogger('qi-manager')
 
 # Load the config.ini file
+config_path = Path(__file__).parent.resolve().joinpath('../config.ini')
 parser = ConfigParser()
-parser.read(Path(__file__).parent.resolve().joinpath('../config.ini'))
+parser.read(config_path)
 
 # Load PostgreSQL section from config.ini
 db = {}
@@ -30,89 +35,41 @@ if parser.has_section('postgresql'):
 else:
     raise Exception('Section postgresql not found in the config.ini file')
 
-# Open connection to the PostgreSQL instance
-db_conn = None
-cur = None
-try:
-    db_conn = psycopg2.connect(**db)
-    cur = db_conn.cursor()
-except (Exception, psycopg2.DatabaseError) as error:
-    db_log.error(str(error))
-    exit()
-
-db_log.info('Successfully connected to %s:%s/%s', db['host'], db['port'], db['database'])
-
-# Initialize PostgreSQL DBs, skip table creation if exists
-commands = (
-    """
-    CREATE TABLE IF NOT EXISTS network_slice_status(
-        network_slice_id UUID PRIMARY KEY,
-        network_slice_status VARCHAR(255) NOT NULL
-    )
-    """,
-    """
-    CREATE TABLE IF NOT EXISTS vertical_application_slice_status(
-        vertical_application_slice_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-        vertical_application_slice_status VARCHAR(255) NOT NULL,
-        network_slice_status UUID,
-        intent JSON NOT NULL,
-        nest_id VARCHAR(255),
-        FOREIGN KEY (network_slice_status)
-            REFERENCES network_slice_status (network_slice_id)
-            ON UPDATE CASCADE ON DELETE CASCADE
-    )
-    """,
-    """
-    CREATE TABLE IF NOT EXISTS vertical_application_quota_status(
-        vertical_application_quota_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-        vertical_application_quota_kubeconfig JSON NOT NULL,
-        vertical_application_slice_id UUID NOT NULL,
-        FOREIGN KEY (vertical_application_slice_id)
-            REFERENCES vertical_application_slice_status (vertical_application_slice_id)
-            ON UPDATE CASCADE ON DELETE CASCADE
-    )
-    """,
-    """
-    CREATE TABLE IF NOT EXISTS clusters(
-        cluster_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-        name VARCHAR(255),
-        type VARCHAR(255)
-    )
-    """,
-    """
-    CREATE TABLE IF NOT EXISTS cluster_nodes(
-        cluster_node_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-        name VARCHAR(255),
-        labels JSON NOT NULL,
-        cluster_id UUID NOT NULL,
-        FOREIGN KEY (cluster_id)
-            REFERENCES clusters (cluster_id)
-            ON UPDATE CASCADE ON DELETE CASCADE
-    )
-    """,
-    """
-    CREATE TABLE IF NOT EXISTS locations(
-        geographical_area_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-        location_name VARCHAR(255),
-        cluster_id UUID NOT NULL,
-        latitude FLOAT(8),
-        longitude FLOAT(8),
-        coverage_radius FLOAT(8),
-        segment VARCHAR(255),
-        FOREIGN KEY (cluster_id)
-            REFERENCES clusters (cluster_id)
-            ON UPDATE CASCADE ON DELETE CASCADE
-    )
-    """
-)
-try:
-    for command in commands:
-        cur.execute(command)
-    cur.close()
-    db_conn.commit()
-except (Exception, psycopg2.DatabaseError) as error:
-    db_log.error(str(error))
-    exit()
+# Load PostgreSQL connection pool section from config.ini, use the defaults if missing
+db_pool_min_size = 1
+db_pool_max_size = 10
+db_pool_timeout = 30.0
+if parser.has_section('postgresql_pool'):
+    db_pool_min_size = parser.getint('postgresql_pool', 'min_size', fallback=db_pool_min_size)
+    db_pool_max_size = parser.getint('postgresql_pool', 'max_size', fallback=db_pool_max_size)
+    db_pool_timeout = parser.getfloat('postgresql_pool', 'timeout', fallback=db_pool_timeout)
+
+if db_pool_min_size < 0 or db_pool_max_size < 1 or db_pool_min_size > db_pool_max_size:
+    raise Exception('Invalid postgresql_pool section in the config.ini file, '
+                    'min_size and max_size must satisfy 0 <= min_size <= max_size and max_size >= 1')
+
+# Load app_quota section from config.ini, use the defaults if missing
+quota_allocation_workers = 8
+quota_token_timeout = 30.0
+quota_warm_pool_size = 0
+quota_warm_pool_interval = 10.0
+quota_instance_id = socket.gethostname()
+if parser.has_section('app_quota'):
+    quota_allocation_workers = parser.getint('app_quota', 'allocation_workers', fallback=quota_allocation_workers)
+    quota_token_timeout = parser.getfloat('app_quota', 'token_timeout', fallback=quota_token_timeout)
+    quota_warm_pool_size = parser.getint('app_quota', 'warm_pool_size', fallback=quota_warm_pool_size)
+    quota_warm_pool_interval = parser.getfloat('app_quota', 'warm_pool_interval', fallback=quota_warm_pool_interval)
+    quota_instance_id = parser.get('app_quota', 'instance_id', fallback=quota_instance_id)
+
+if quota_allocation_workers < 1 or quota_token_timeout <= 0 or quota_warm_pool_size < 0 or \
+        quota_warm_pool_interval <= 0:
+    raise Exception('Invalid app_quota section in the config.ini file, allocation_workers must be >= 1, '
+                    'warm_pool_size must be >= 0 and token_timeout and warm_pool_interval must be > 0')
+
+# The instance id labels the warm namespaces, so it must be a valid K8s label value
+if re.match(r'^[A-Za-z0-9]([-A-Za-z0-9_.]{0,61}[A-Za-z0-9])?$', quota_instance_id) is None:
+    raise Exception('Invalid instance_id ' + quota_instance_id + ' in app_quota section of config.ini file, '
+                    'it must be a K8s label value')
 
 # Load nest_catalogue section from config.ini
 nest_catalogue_url = None
@@ -123,12 +80,39 @@ if parser.has_section('nest_catalogue'):
 else:
     raise Exception('Section nest_catalogue not found in the config.ini file')
 
-# Load QI section from config.ini
-qi = {}
+# Seconds a fetched NEST Catalogue is served as fresh, and for how many seconds more it
+# is still served (stale) while it is revalidated in background
+nest_catalogue_cache_ttl = parser.getfloat('nest_catalogue', 'cache_ttl', fallback=60.0)
+nest_catalogue_cache_stale_ttl = parser.getfloat('nest_catalogue', 'cache_stale_ttl', fallback=300.0)
+
+# Seconds to connect to the NEST Catalogue and to wait for its response before a fetch fails
+nest_catalogue_timeout = (parser.getfloat('nest_catalogue', 'connect_timeout', fallback=5.0),
+                          parser.getfloat('nest_catalogue', 'read_timeout', fallback=30.0))
+
+# Seconds between two fetches of the NEST Catalogue by the background prefetcher, 0 disables the prefetcher
+# and the catalogue is fetched on the request path according to the TTLs above
+nest_catalogue_prefetch_interval = parser.getfloat('nest_catalogue', 'prefetch_interval', fallback=0.0)
+
+# NEST selection engine: 'index' (bisect over sorted buckets) or 'numpy' (vectorized masks, requires numpy)
+nest_selection_engine = parser.get('nest_catalogue', 'selection_engine', fallback='index')
+if nest_selection_engine not in ('index', 'numpy'):
+    raise Exception('Invalid selection_engine ' + nest_selection_engine + ' in nest_catalogue section of '
+                    'config.ini file, allowed values are index and numpy')
+
+# Number of selected NESTs cached by networking constraints fingerprint, 0 disables the cache
+nest_selection_cache_size = parser.getint('nest_catalogue', 'selection_cache_size', fallback=1024)
+
+# Seconds between checks of config.ini for changes of the qi section, 0 disables the file watch
+# (the QI table can still be reloaded by sending SIGHUP to the process)
+qi_watch_interval = parser.getfloat('nest_catalogue', 'qi_watch_interval', fallback=0.0)
+
+# Load QI section from config.ini, compiled in a read-only QI -> <Slice Type, delay, error rate> mapping
+qi = None
 if parser.has_section('qi'):
-    params = parser.items('qi')
-    for param in params:
-        qi[param[0]] = loads(param[1])
+    try:
+        qi = compile_qi(parser.items('qi'))
+    except ValueError as e:
+        raise Exception(str(e))
 else:
     raise Exception('Section qi not found in the config.ini file')
 
@@ -1,28 +1,66 @@
-from typing import List
+from typing import List, Optional
 
-from kubernetes import client, config
-from kubernetes.config.kube_config import ConfigException
+from kubernetes import client, watch
 from kubernetes.client.rest import ApiException
-from core import quota_log
+from core import quota_log, quota_allocation_workers, quota_token_timeout, quota_warm_pool_size, \
+    quota_warm_pool_interval, quota_instance_id
 from core import exceptions
 from core import db_manager
+from core import kube_client_manager
+from core import quantity
 from base64 import b64decode
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from threading import Lock, Thread
+from math import ceil
+import os
+import time
 import uuid
-import re
 
-pattern = re.compile('^([+-]?[0-9.]+)([eEinumkKMGTP]*[-+]?[0-9]*)$')
+# Bounded pool allocating (or rolling back) the quotas of an intent in all its K8s clusters concurrently
+quota_executor = ThreadPoolExecutor(max_workers=quota_allocation_workers, thread_name_prefix='quota-allocation')
+
+# Pool issuing concurrently the independent K8s requests of the quota allocations, 4 for each allocation
+k8s_request_executor = ThreadPoolExecutor(max_workers=quota_allocation_workers * 4, thread_name_prefix='k8s-request')
+
+
+# Seconds waited for the tokens of the created ServiceAccounts
+token_wait_stats = {
+    'count': 0,
+    'timeouts': 0,
+    'total': 0.0,
+    'max': 0.0,
+    'last': None
+}
+token_wait_stats_lock = Lock()
+
+# Warm pool: kubeconfigs of ready namespace + ServiceAccount + token bundles by K8s context, created with a
+# zero quota. Each process keeps its own pool, so the bundles are labelled with the instance id and the pid
+# of the owning process: at startup a process deletes only the bundles of its instance left by a process no
+# longer running, never the ones pooled by the other processes or replicas
+warm_pool = {}
+warm_pool_lock = Lock()
+warm_pool_label = 'app-aware-nsm/warm-pool'
+warm_pool_pid_label = 'app-aware-nsm/warm-pool-pid'
+warm_pool_labels = {warm_pool_label: quota_instance_id, warm_pool_pid_label: str(os.getpid())}
+warm_pool_quota = {'cpu': '0', 'ram': '0', 'storage': '0'}
+
+# <K8s context, host> pairs where the ns-sa-permissions ClusterRole is known to exist
+cluster_roles = set()
+cluster_roles_lock = Lock()
+
+
+def delete_namespace(core_api: client.CoreV1Api, host: str, ns_name: str):
+    # Best effort removal of a namespace left by a failed allocation
+    try:
+        core_api.delete_namespace(name=ns_name)
+        quota_log.info('Deleted Namespace %s in K8s cluster %s.', ns_name, host)
+    except ApiException as e:
+        quota_log.error('Cannot delete Namespace %s in K8s cluster %s: %s', ns_name, host, str(e))
 
 
-def create_constrained_ns(core_api: client.CoreV1Api, host: str, computing_constraint) -> str:
-    # Create a namespace with random uuid as name
-    ns_name = str(uuid.uuid4())
-    ns = client.V1Namespace(metadata=client.V1ObjectMeta(name=ns_name))
-    core_api.create_namespace(ns)
-
-    quota_log.info('Created Namespace %s in K8s cluster %s.', ns_name, host)
-
-    # Create the quota resource to constrain the created namespace
-    rq = client.V1ResourceQuota(
+def build_resource_quota(ns_name: str, computing_constraint) -> client.V1ResourceQuota:
+    return client.V1ResourceQuota(
         metadata=client.V1ObjectMeta(name=ns_name + '-quota'),
         spec=client.V1ResourceQuotaSpec(hard={
             'requests.cpu': computing_constraint['cpu'],
@@ -32,17 +70,29 @@ def create_constrained_ns(core_api: client.CoreV1Api, host: str, computing_const
             'requests.storage': computing_constraint['storage']
         })
     )
-    core_api.create_namespaced_resource_quota(ns_name, rq)
 
-    quota_log.info('Created ResourceQuota %s-quota in K8s cluster %s.', ns_name, host)
+
+def create_namespace(core_api: client.CoreV1Api, host: str, labels: dict = None) -> str:
+    # Create a namespace with random uuid as name
+    ns_name = str(uuid.uuid4())
+    ns = client.V1Namespace(metadata=client.V1ObjectMeta(name=ns_name, labels=labels))
+    core_api.create_namespace(ns)
+
+    quota_log.info('Created Namespace %s in K8s cluster %s.', ns_name, host)
 
     return ns_name
 
 
-def create_constrained_sa(core_api: client.CoreV1Api, host: str,
-                          rbac_api: client.RbacAuthorizationV1Api, ns_name: str) -> str:
-    # Create a ServiceAccount with random uuid as name
-    sa_name = str(uuid.uuid4())
+def create_resource_quota(core_api: client.CoreV1Api, host: str, ns_name: str, computing_constraint):
+    # Create the quota resource to constrain the namespace
+    core_api.create_namespaced_resource_quota(ns_name, build_resource_quota(ns_name, computing_constraint))
+
+    quota_log.info('Created ResourceQuota %s-quota in K8s cluster %s.', ns_name, host)
+
+
+def create_service_account(core_api: client.CoreV1Api, host: str, ns_name: str, sa_name: str):
+    # Create the ServiceAccount and then its token Secret, that the token controller
+    # would delete if it referenced a ServiceAccount not existing yet
     sa = client.V1ServiceAccount(metadata=client.V1ObjectMeta(name=sa_name))
     core_api.create_namespaced_service_account(ns_name, sa)
 
@@ -54,6 +104,8 @@ def create_constrained_sa(core_api: client.CoreV1Api, host: str,
 
     quota_log.info('Created Secret Token for Service Account %s in K8s cluster %s.', sa_name, host)
 
+
+def create_cluster_role(rbac_api: client.RbacAuthorizationV1Api, host: str):
     # Create ClusterRole to define Service Accounts permissions in given namespace(s)
     c_role = client.V1ClusterRole(
         metadata=client.V1ObjectMeta(name='ns-sa-permissions'),
@@ -79,7 +131,23 @@ def create_constrained_sa(core_api: client.CoreV1Api, host: str,
         else:
             raise e
 
-    # Bind the created ServiceAccount to the ClusterRole to limit the access to the given namespace
+
+def ensure_cluster_role(rbac_api: client.RbacAuthorizationV1Api, context: str, host: str):
+    # The ClusterRole is cluster-scoped and shared by all the quotas: create it once per cluster, before any
+    # RoleBinding referencing it. Binding a missing ClusterRole is rejected by the RBAC escalation check
+    # unless the credentials have the bind verb
+    with cluster_roles_lock:
+        if (context, host) in cluster_roles:
+            return
+
+    create_cluster_role(rbac_api, host)
+
+    with cluster_roles_lock:
+        cluster_roles.add((context, host))
+
+
+def create_role_binding(rbac_api: client.RbacAuthorizationV1Api, host: str, ns_name: str, sa_name: str):
+    # Bind the ServiceAccount to the ClusterRole to limit the access to the given namespace
     rb = client.V1RoleBinding(
         metadata=client.V1ObjectMeta(name=sa_name + '-role-binding'),
         subjects=[
@@ -99,34 +167,118 @@ def create_constrained_sa(core_api: client.CoreV1Api, host: str,
 
     quota_log.info('Created RoleBinding %s-role-binding in K8s cluster %s.', sa_name, host)
 
+
+def create_quota_resources(core_api: client.CoreV1Api, host: str, rbac_api: client.RbacAuthorizationV1Api,
+                           ns_name: str, computing_constraint) -> str:
+    # Once the namespace and the ClusterRole exist, the ResourceQuota, the ServiceAccount (with its Secret)
+    # and the RoleBinding (that only references the ServiceAccount and ClusterRole by name) do not depend
+    # on each other: create them concurrently, through the same pooled ApiClient
+    sa_name = str(uuid.uuid4())
+    futures = [
+        k8s_request_executor.submit(create_resource_quota, core_api, host, ns_name, computing_constraint),
+        k8s_request_executor.submit(create_service_account, core_api, host, ns_name, sa_name),
+        k8s_request_executor.submit(create_role_binding, rbac_api, host, ns_name, sa_name)
+    ]
+
+    # Wait for all the requests before failing, so that none is still in progress during the rollback
+    errors = []
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            errors.append(e)
+
+    if len(errors) > 0:
+        raise errors[0]
+
     return sa_name
 
 
-def allocate_quota(computing_constraint, context: str):
-    try:
-        # Load the kubeconfig at .kube/config and change context to create
-        # the resources for the quota in the specified K8s cluster
-        config.load_kube_config(context=context)
-    except ConfigException:
-        # If .kube/config context is missing
-        quota_log.error('Missing context ' + context + ' in .kube/config, abort.')
-        raise exceptions.MissingContextException('Missing context ' + context)
+def record_token_wait(duration: float, timeout: bool):
+    with token_wait_stats_lock:
+        token_wait_stats['count'] += 1
+        token_wait_stats['total'] += duration
+        token_wait_stats['last'] = duration
+        if duration > token_wait_stats['max']:
+            token_wait_stats['max'] = duration
+        if timeout:
+            token_wait_stats['timeouts'] += 1
+
+
+def get_token_wait_stats() -> dict:
+    with token_wait_stats_lock:
+        return dict(token_wait_stats)
+
+
+def is_token_ready(secret: client.V1Secret) -> bool:
+    return secret.data is not None and 'token' in secret.data
+
 
+def wait_for_sa_token(core_api: client.CoreV1Api, host: str, sa_name: str, ns_name: str) -> client.V1Secret:
+    # Wait for the token controller to fill the Secret of the ServiceAccount, watching the Secret
+    # from the version just read instead of polling it, for at most the configured token timeout
+    secret_name = sa_name + '-token'
+    start = time.monotonic()
+    deadline = start + quota_token_timeout
+
+    secret = core_api.read_namespaced_secret(secret_name, ns_name)
+    while not is_token_ready(secret):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            record_token_wait(time.monotonic() - start, True)
+            quota_log.error('Token of ServiceAccount %s in K8s cluster %s not ready after %ss.',
+                            sa_name, host, quota_token_timeout)
+            raise exceptions.ServiceAccountSecretException('Token of ServiceAccount ' + sa_name +
+                                                           ' not ready after ' + str(quota_token_timeout) + 's')
+
+        # The server closes the watch at its timeout, the Secret is read and watched again until the deadline
+        # (also when the version read is too old to be watched, 410 Gone)
+        w = watch.Watch()
+        try:
+            for event in w.stream(core_api.list_namespaced_secret, ns_name,
+                                  field_selector='metadata.name=' + secret_name,
+                                  resource_version=secret.metadata.resource_version,
+                                  timeout_seconds=max(1, ceil(remaining))):
+                if event['type'] in ('ADDED', 'MODIFIED') and is_token_ready(event['object']):
+                    secret = event['object']
+                    break
+        except ApiException as e:
+            if e.status != 410:
+                raise e
+        finally:
+            w.stop()
+
+        if not is_token_ready(secret):
+            secret = core_api.read_namespaced_secret(secret_name, ns_name)
+
+    duration = time.monotonic() - start
+    record_token_wait(duration, False)
+    quota_log.info('Token of ServiceAccount %s in K8s cluster %s ready in %.3fs.', sa_name, host, duration)
+
+    return secret
+
+
+def create_quota(api_client: client.ApiClient, context: str, computing_constraint, labels: dict = None) -> dict:
     # Get host of K8s cluster
-    host = client.Configuration.get_default_copy().host
+    host = api_client.configuration.host
 
     # Create K8s clients
-    with client.ApiClient() as api_client:
-        core_api = client.CoreV1Api(api_client)
-        rbac_api = client.RbacAuthorizationV1Api(api_client)
+    core_api = client.CoreV1Api(api_client)
+    rbac_api = client.RbacAuthorizationV1Api(api_client)
 
-    # Create the resources for the quota
-    ns_name = create_constrained_ns(core_api, host, computing_constraint)
-    sa_name = create_constrained_sa(core_api, host, rbac_api, ns_name)
+    # Create the resources for the quota, removing the namespace (and so all of them) if any step fails.
+    # On failure the ClusterRole is checked again by the next allocation, in case it was deleted meanwhile
+    ensure_cluster_role(rbac_api, context, host)
+    ns_name = create_namespace(core_api, host, labels)
+    try:
+        sa_name = create_quota_resources(core_api, host, rbac_api, ns_name, computing_constraint)
 
-    secret = core_api.read_namespaced_secret(sa_name + '-token', ns_name)
-    while secret.data is None:
-        secret = core_api.read_namespaced_secret(sa_name + '-token', ns_name)
+        secret = wait_for_sa_token(core_api, host, sa_name, ns_name)
+    except Exception:
+        with cluster_roles_lock:
+            cluster_roles.discard((context, host))
+        delete_namespace(core_api, host, ns_name)
+        raise
 
     # Get the ca.crt and token of the ServiceAccount created
     sa_secret_data = secret.data
@@ -165,87 +317,268 @@ def allocate_quota(computing_constraint, context: str):
     }
 
 
-def aggregate_quotas(cs_a: dict, cs_b: dict) -> dict:
-    if cs_a is None:
+def claim_warm_quota(api_client: client.ApiClient, context: str, computing_constraint) -> Optional[dict]:
+    # Take a bundle from the warm pool of the context, if any, and resize its quota to the computing constraint.
+    # The bundle is unlabelled so that it is no longer deleted as a leftover of the warm pool
+    with warm_pool_lock:
+        bundles = warm_pool.get(context)
+        if not bundles:
+            return None
+        kubeconfig = bundles.popleft()
+
+    host = api_client.configuration.host
+    core_api = client.CoreV1Api(api_client)
+    ns_name = kubeconfig['contexts'][0]['context']['namespace']
+    try:
+        core_api.patch_namespaced_resource_quota(ns_name + '-quota', ns_name,
+                                                 build_resource_quota(ns_name, computing_constraint))
+        core_api.patch_namespace(ns_name, {'metadata': {'labels': {warm_pool_label: None, warm_pool_pid_label: None}}})
+    except ApiException as e:
+        quota_log.warning('Cannot claim warm Namespace %s in K8s cluster %s: %s', ns_name, host, str(e))
+        delete_namespace(core_api, host, ns_name)
+        return None
+
+    quota_log.info('Claimed warm Namespace %s in K8s cluster %s.', ns_name, host)
+
+    return kubeconfig
+
+
+def allocate_quota(computing_constraint, context: str):
+    # Get the ApiClient of the kubeconfig context to create
+    # the resources for the quota in the specified K8s cluster
+    api_client = kube_client_manager.get_api_client(context)
+
+    # Resize a ready bundle of the warm pool if available, otherwise create all the resources
+    kubeconfig = claim_warm_quota(api_client, context, computing_constraint)
+    if kubeconfig is not None:
+        return kubeconfig
+
+    return create_quota(api_client, context, computing_constraint)
+
+
+def is_process_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+def delete_warm_pool_leftovers(api_client: client.ApiClient):
+    # Delete the warm namespaces of this instance never claimed by a process no longer running. The processes of
+    # an instance run on the same host, so their pids can be checked. Called before the pool of the context is
+    # filled, so the namespaces labelled with the pid of this process are leftovers too, e.g. of a container
+    # restarted with the same pid
+    host = api_client.configuration.host
+    core_api = client.CoreV1Api(api_client)
+    pid = str(os.getpid())
+    for ns in core_api.list_namespace(label_selector=warm_pool_label + '=' + quota_instance_id).items:
+        owner = (ns.metadata.labels or {}).get(warm_pool_pid_label, '')
+        if owner == pid or not owner.isdigit() or not is_process_running(int(owner)):
+            delete_namespace(core_api, host, ns.metadata.name)
+
+
+def drain_warm_pool_context(context: str):
+    # Delete the bundles pooled for a context no longer in the DB
+    with warm_pool_lock:
+        bundles = warm_pool.pop(context, None)
+    if not bundles:
+        return
+
+    ns_names = [kubeconfig['contexts'][0]['context']['namespace'] for kubeconfig in bundles]
+    try:
+        api_client = kube_client_manager.get_api_client(context)
+    except exceptions.MissingContextException:
+        quota_log.error('Cannot drain the warm pool of removed context %s, Namespaces %s left.', context,
+                        ', '.join(ns_names))
+        return
+
+    host = api_client.configuration.host
+    core_api = client.CoreV1Api(api_client)
+    for ns_name in ns_names:
+        delete_namespace(core_api, host, ns_name)
+
+
+def fill_warm_pool_context(context: str):
+    api_client = kube_client_manager.get_api_client(context)
+    with warm_pool_lock:
+        bundles = warm_pool.setdefault(context, deque())
+
+    while len(bundles) < quota_warm_pool_size:
+        bundles.append(create_quota(api_client, context, warm_pool_quota, warm_pool_labels))
+
+
+def fill_warm_pool():
+    # Keep quota_warm_pool_size ready bundles in the warm pool of each cluster stored in the DB, and drain
+    # the pools of the clusters removed or renamed. The warm namespaces left by the previous processes
+    # of this instance are deleted the first time a cluster is seen
+    cleaned_contexts = set()
+    while True:
+        contexts = None
+        try:
+            contexts = sorted(set(cluster[1] for cluster in db_manager.get_clusters() if cluster[1] is not None))
+        except exceptions.DBException as e:
+            quota_log.error('Cannot load the clusters to fill the warm pool: %s', str(e))
+
+        if contexts is None:
+            time.sleep(quota_warm_pool_interval)
+            continue
+
+        with warm_pool_lock:
+            removed_contexts = [context for context in warm_pool if context not in contexts]
+        for context in removed_contexts:
+            cleaned_contexts.discard(context)
+            try:
+                drain_warm_pool_context(context)
+            except Exception as e:
+                quota_log.error('Cannot drain the warm pool of removed context %s: %s', context, str(e))
+
+        for context in contexts:
+            try:
+                if context not in cleaned_contexts:
+                    delete_warm_pool_leftovers(kube_client_manager.get_api_client(context))
+                    cleaned_contexts.add(context)
+                fill_warm_pool_context(context)
+            except Exception as e:
+                quota_log.error('Cannot fill the warm pool of context %s: %s', context, str(e))
+
+        time.sleep(quota_warm_pool_interval)
+
+
+def parse_computing_constraint(computing_constraint: dict) -> dict:
+    # Parse the requirements of a computing constraint in milli-CPUs and bytes, e.g. 500m and 4Gi
+    try:
         return {
-            'cpu': cs_b['cpu'],
-            'ram': cs_b['ram'],
-            'storage': cs_b['storage']
+            'cpu': quantity.parse_cpu(computing_constraint['cpu']),
+            'ram': quantity.parse_bytes(computing_constraint['ram']),
+            'storage': quantity.parse_bytes(computing_constraint['storage'])
         }
+    except exceptions.QuantitiesMalformedException as e:
+        raise exceptions.QuantitiesMalformedException(str(e) + ' in computing constraint of application component ' +
+                                                      str(computing_constraint.get('applicationComponentId')))
+
+
+def aggregate_quotas(cs_a: dict, cs_b: dict) -> dict:
+    # Exact sum of two parsed computing constraints
+    if cs_a is None:
+        return dict(cs_b)
+
+    return {
+        'cpu': cs_a['cpu'] + cs_b['cpu'],
+        'ram': cs_a['ram'] + cs_b['ram'],
+        'storage': cs_a['storage'] + cs_b['storage']
+    }
 
-    cpu_a = pattern.search(cs_a['cpu'])
-    ram_a = pattern.search(cs_a['ram'])
-    sto_a = pattern.search(cs_a['storage'])
 
+def format_quota(quota: dict) -> dict:
     return {
-        'cpu': str(int(cpu_a.group(1)) + int(pattern.search(cs_b['cpu']).group(1))) + cpu_a.group(2),
-        'ram': str(int(ram_a.group(1)) + int(pattern.search(cs_b['ram']).group(1))) + ram_a.group(2),
-        'storage': str(int(sto_a.group(1)) + int(pattern.search(cs_b['storage']).group(1))) + sto_a.group(2)
+        'cpu': quantity.format_cpu(quota['cpu']),
+        'ram': quantity.format_bytes(quota['ram']),
+        'storage': quantity.format_bytes(quota['storage'])
     }
 
 
+def get_canonical_area_id(geographical_area_id) -> str:
+    # Geographical area IDs are UUIDs, compared in their canonical (lowercase, hyphenated) form as stored in the DB
+    try:
+        return str(uuid.UUID(str(geographical_area_id)))
+    except ValueError:
+        raise exceptions.MalformedIntentException('Malformed geographical area ID ' + str(geographical_area_id))
+
+
+def get_quota_locations(geographical_area_ids) -> dict:
+    # Load at once the locations, with their cluster and nodes, of the given canonical geographical area IDs
+    if len(geographical_area_ids) == 0:
+        return {}
+
+    return {location['geographicalAreaId']: location
+            for location in db_manager.get_location_info(set(geographical_area_ids))}
+
+
+def check_quota_locations(geographical_area_ids, locations: dict):
+    missing_locations = [geographical_area_id for geographical_area_id in geographical_area_ids
+                         if geographical_area_id not in locations]
+    if len(missing_locations) > 0:
+        raise exceptions.NotExistingEntityException('location(s) with ID ' + ', '.join(missing_locations) +
+                                                    ' not found.')
+
+
 def build_quotas(location_constraints: dict, computing_constraints: dict) -> dict:
+    # Index the computing constraints by application component, parsing each one once.
+    # Requirements must be K8s quantities e.g. 4Gi
+    components_constraint_map = {}
     for computing_constraint in computing_constraints:
-        # Requirements must match the regex e.g. 4Gi
-        if not pattern.match(computing_constraint.get('cpu')) or \
-                not pattern.match(computing_constraint.get('ram') or
-                                  not pattern.match(computing_constraint.get('storage'))):
-            raise exceptions.QuantitiesMalformedException('Quantities must match the regular expression '
-                                                          '^([+-]?[0-9.]+)([eEinumkKMGTP]*[-+]?[0-9]*)$')
-
-    components_location_map = {}
+        component = computing_constraint.get('applicationComponentId')
+        if component in components_constraint_map:
+            raise exceptions.MalformedIntentException('Duplicated computing constraint for application component ' +
+                                                      str(component))
+        components_constraint_map[component] = parse_computing_constraint(computing_constraint)
+
+    # Aggregate the computing constraints by geographical area in a single pass over the location constraints
+    quotas = {}
+    missing_components = []
     for loc in location_constraints:
-        if loc['geographicalAreaId'] not in components_location_map:
-            components_location_map[loc['geographicalAreaId']] = []
+        computing_constraint = components_constraint_map.get(loc.get('applicationComponentId'))
+        if computing_constraint is None:
+            missing_components.append(str(loc.get('applicationComponentId')))
+            continue
 
-        components_location_map[loc['geographicalAreaId']].append(loc['applicationComponentId'])
+        geographical_area_id = get_canonical_area_id(loc.get('geographicalAreaId'))
+        quotas[geographical_area_id] = aggregate_quotas(quotas.get(geographical_area_id), computing_constraint)
 
-    quotas = {}
-    for geographicalAreaId, components in components_location_map.items():
-        quota = None
-        for component in components:
-            quota = aggregate_quotas(quota, [cc for cc in computing_constraints
-                                             if cc['applicationComponentId'] == component][0])
-        quotas[geographicalAreaId] = quota
+    if len(missing_components) > 0:
+        raise exceptions.MalformedIntentException('Missing computing constraint for application component(s) ' +
+                                                  ', '.join(sorted(set(missing_components))))
 
-    return quotas
+    return {geographicalAreaId: format_quota(quota) for geographicalAreaId, quota in quotas.items()}
+
+
+def rollback_quotas(k8s_configs: List[dict]):
+    # Delete concurrently the quotas already allocated by a failed allocation, logging the failures
+    futures = [(k8s_config, quota_executor.submit(delete_quota, k8s_config)) for k8s_config in k8s_configs]
+    for k8s_config, future in futures:
+        try:
+            future.result()
+            quota_log.info('Rolled back quota of location %s.', k8s_config['geographicalAreaId'])
+        except Exception as e:
+            quota_log.error('Cannot roll back quota of location %s: %s', k8s_config['geographicalAreaId'], str(e))
 
 
 def allocate_quotas(location_constraints: dict, computing_constraints: dict) -> List[dict]:
     # Allocate quota for each computing constraint in the request
-    k8s_configs = []
-
     quotas = build_quotas(location_constraints, computing_constraints)
 
-    _locations = db_manager.get_locations()
-    locations = []
-    for location in _locations:
-        cluster_id = location[2]
+    # Load only the locations referenced by the intent, with their cluster and nodes,
+    # and check that all of them exist before creating anything
+    locations = get_quota_locations(quotas.keys())
+    check_quota_locations(quotas.keys(), locations)
 
-        cluster = db_manager.get_cluster_by_id(cluster_id)
-        nodes = db_manager.get_cluster_nodes_by_cluster_id(cluster_id)
+    # Allocate the quotas in all the clusters concurrently, the latency is the one of the slowest cluster
+    futures = [(geographicalAreaId, quota_executor.submit(allocate_quota, quota,
+                                                          locations[geographicalAreaId]['cluster']['name']))
+               for geographicalAreaId, quota in quotas.items()]
 
-        locations.append({
-            'geographicalAreaId': location[0],
-            'locationName': location[1],
-            'cluster': {
-                'name': cluster[1],
-                'type': cluster[2],
-                'nodes': [{'name': n[1], 'labels': n[2]} for n in nodes]
-            },
-            'latitude': location[3],
-            'longitude': location[4],
-            'coverageRadius': location[5],
-            'segment': location[6]
-        })
+    k8s_configs = []
+    errors = []
+    for geographicalAreaId, future in futures:
+        try:
+            k8s_config = future.result()
+        except Exception as e:
+            quota_log.error('Quota allocation failed for location %s: %s', geographicalAreaId, str(e))
+            errors.append(e)
+            continue
 
-    for geographicalAreaId, quota in quotas.items():
-        k8s_config = allocate_quota(quota, [location for location in locations
-                                            if location['geographicalAreaId']
-                                            == geographicalAreaId][0]['cluster']['name'])
         k8s_config['geographicalAreaId'] = geographicalAreaId
         k8s_configs.append(k8s_config)
 
+    # All or nothing: if any allocation failed, delete the quotas allocated in the other clusters
+    if len(errors) > 0:
+        rollback_quotas(k8s_configs)
+        raise errors[0]
+
     return k8s_configs
 
 
@@ -254,7 +587,7 @@ def update_quotas(location_constraints: dict, computing_constraints: dict, curre
 
     for geographicalAreaId, quota in quotas.items():
         current_quota = [current_quota for current_quota in current_quotas
-                         if current_quota[1]['geographicalAreaId'] == geographicalAreaId]
+                         if get_canonical_area_id(current_quota[1]['geographicalAreaId']) == geographicalAreaId]
 
         if len(current_quota) == 0:
             raise exceptions.FailedQuotaScalingException('Missing quota for location ' + geographicalAreaId)
@@ -262,20 +595,9 @@ def update_quotas(location_constraints: dict, computing_constraints: dict, curre
         current_quota = current_quota[0][1]
         ns_name = current_quota['contexts'][0]['context']['namespace']
 
-        rq = client.V1ResourceQuota(
-            metadata=client.V1ObjectMeta(name=ns_name + '-quota'),
-            spec=client.V1ResourceQuotaSpec(hard={
-                'requests.cpu': quota['cpu'],
-                'requests.memory': quota['ram'],
-                'limits.cpu': quota['cpu'],
-                'limits.memory': quota['ram'],
-                'requests.storage': quota['storage']
-            })
-        )
+        rq = build_resource_quota(ns_name, quota)
 
-        config.load_kube_config(context=current_quota['current-context'])
-        with client.ApiClient() as api_client:
-            core_api = client.CoreV1Api(api_client)
+        core_api = client.CoreV1Api(kube_client_manager.get_api_client(current_quota['current-context']))
 
         try:
             core_api.patch_namespaced_resource_quota(ns_name + '-quota', ns_name, rq)
@@ -284,9 +606,7 @@ def update_quotas(location_constraints: dict, computing_constraints: dict, curre
 
 
 def delete_quota(kubeconfig):
-    config.load_kube_config(context=kubeconfig['current-context'])
-    with client.ApiClient() as api_client:
-        core_api = client.CoreV1Api(api_client)
+    core_api = client.CoreV1Api(kube_client_manager.get_api_client(kubeconfig['current-context']))
 
     try:
         core_api.delete_namespace(name=kubeconfig['contexts'][0]['context']['namespace'])
@@ -300,3 +620,7 @@ def delete_quotas(quotas):
             delete_quota(quota[1])
     except ApiException as e:
         raise e
+
+
+if quota_warm_pool_size > 0:
+    Thread(target=fill_warm_pool, daemon=True).start()
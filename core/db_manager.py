@@ -1,7 +1,94 @@
-from core import db_conn, db_log
+from core import db, db_pool_min_size, db_pool_max_size, db_pool_timeout, db_log
+from core.db_pool import BlockingConnectionPool
+from contextlib import contextmanager
+from threading import local
 from psycopg2 import DatabaseError
+from psycopg2.pool import PoolError
+from psycopg2.extras import execute_values
 from core.exceptions import DBException, NotExistingEntityException
 import json
+import uuid
+
+# Open the connection pool to the PostgreSQL instance. It is opened here, on the first import of the DB layer,
+# and not by the core package: the modules not accessing the DB (e.g. quantity) import without side effects
+db_pool = None
+try:
+    db_pool = BlockingConnectionPool(db_pool_min_size, db_pool_max_size, db_pool_timeout, **db)
+except (Exception, DatabaseError) as error:
+    db_log.error(str(error))
+    exit()
+
+db_log.info('Successfully connected to %s:%s/%s (pool size %s-%s)', db['host'], db['port'], db['database'],
+            db_pool_min_size, db_pool_max_size)
+
+
+# Number of rows fetched per round trip by the server-side cursors of the stream_* functions
+stream_batch_size = 500
+
+# Connection of the transaction open in the current thread, if any
+transaction_state = local()
+
+
+def get_connection():
+    try:
+        return db_pool.getconn()
+    except PoolError as error:
+        db_log.error(str(error))
+        raise DBException('Error while acquiring a DB connection: ' + str(error))
+
+
+@contextmanager
+def transaction():
+    # Group all the db_manager calls made by this thread inside the block in a single
+    # transaction, committed when the block exits and rolled back on any error.
+    # Nested blocks join the outermost transaction
+    if getattr(transaction_state, 'conn', None) is not None:
+        yield
+        return
+
+    conn = get_connection()
+    transaction_state.conn = conn
+    try:
+        yield
+        try:
+            conn.commit()
+        except DatabaseError as error:
+            db_log.error(str(error))
+            raise DBException('Error while committing transaction: ' + str(error))
+    except BaseException:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        transaction_state.conn = None
+        db_pool.putconn(conn)
+
+
+@contextmanager
+def get_cursor(name: str = None, batch_size: int = stream_batch_size):
+    # Check out a connection from the pool for the duration of the block, commit
+    # on success, roll back on any error and always return the connection to the pool.
+    # Inside transaction() the connection of the transaction is used and left open.
+    # A name opens a server-side cursor, iterated fetching batch_size rows at a time
+    conn = getattr(transaction_state, 'conn', None)
+    if conn is not None:
+        with conn.cursor(name=name) as cur:
+            cur.itersize = batch_size
+            yield cur
+        return
+
+    conn = get_connection()
+    try:
+        with conn.cursor(name=name) as cur:
+            cur.itersize = batch_size
+            yield cur
+        conn.commit()
+    except BaseException:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        db_pool.putconn(conn)
 
 
 def insert_va_quota_status(kubeconfig, vertical_application_slice_id: str):
@@ -11,11 +98,9 @@ def insert_va_quota_status(kubeconfig, vertical_application_slice_id: str):
     vertical_application_slice_id) VALUES (%s, %s) RETURNING vertical_application_quota_id
     """
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (json.dumps(kubeconfig), vertical_application_slice_id))
-        va_quota_id = cur.fetchone()[0]
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (json.dumps(kubeconfig), vertical_application_slice_id))
+            va_quota_id = cur.fetchone()[0]
 
         db_log.info('Created new va_quota_status with ID %s', va_quota_id)
 
@@ -29,10 +114,9 @@ def get_va_quota_status():
     # Retrieve all va_quota_status entries from the DB
     command = """SELECT * FROM vertical_application_quota_status"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command)
-        va_quota_status = cur.fetchall()
-        cur.close()
+        with get_cursor() as cur:
+            cur.execute(command)
+            va_quota_status = cur.fetchall()
 
         return va_quota_status
     except (Exception, DatabaseError) as error:
@@ -44,10 +128,9 @@ def get_va_quota_status_by_id(vertical_application_quota_id: str):
     # Retrieve va_quota_status entry by vertical_application_quota_id (PRIMARY KEY)
     command = """SELECT * FROM vertical_application_quota_status WHERE vertical_application_quota_id = (%s)"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (vertical_application_quota_id,))
-        va_quota_status = cur.fetchone()
-        cur.close()
+        with get_cursor() as cur:
+            cur.execute(command, (vertical_application_quota_id,))
+            va_quota_status = cur.fetchone()
 
         if va_quota_status is None:
             raise NotExistingEntityException('va_quota_status with ID ' +
@@ -63,10 +146,9 @@ def get_va_quota_status_by_vas_id(vertical_application_slice_id: str):
     # Retrieve all va_quota_status linked to the given vertical_application_slice_id
     command = """SELECT * FROM vertical_application_quota_status WHERE vertical_application_slice_id = (%s)"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (vertical_application_slice_id, ))
-        va_quota_status = cur.fetchall()
-        cur.close()
+        with get_cursor() as cur:
+            cur.execute(command, (vertical_application_slice_id, ))
+            va_quota_status = cur.fetchall()
 
         return va_quota_status
     except (Exception, DatabaseError) as error:
@@ -78,10 +160,8 @@ def delete_va_quota_by_vas_id(vertical_application_slice_id: str):
     # Delete all va_quota_status linked to the given vertical_application_slice_id
     command = """DELETE FROM vertical_application_quota_status WHERE vertical_application_slice_id = (%s)"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (vertical_application_slice_id,))
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (vertical_application_slice_id,))
 
         db_log.info('Removed vertical_application_quota_status for vertical_application_slice_id %s',
                     vertical_application_slice_id)
@@ -94,10 +174,8 @@ def insert_network_slice_status(network_slice_id: str, network_slice_status: str
     # Create a new entry <network_slice_id, network_slice_status> in the DB for a network slice
     command = """INSERT INTO network_slice_status(network_slice_id, network_slice_status) VALUES (%s, %s)"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (network_slice_id, network_slice_status))
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (network_slice_id, network_slice_status))
 
         db_log.info('Created new network_slice_status with ID %s', network_slice_id)
     except (Exception, DatabaseError) as error:
@@ -109,10 +187,8 @@ def update_network_slice_status(network_slice_id: str, network_slice_status: str
     # Update a network_slice_status status
     command = """UPDATE network_slice_status SET network_slice_status = %s WHERE network_slice_id = %s"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (network_slice_status, network_slice_id))
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (network_slice_status, network_slice_id))
 
         db_log.info('Updated network_slice_status %s with status %s', network_slice_id, network_slice_status)
     except (Exception, DatabaseError) as error:
@@ -124,10 +200,9 @@ def get_network_slice_status():
     # Retrieve all network_slice_status entries from the DB
     command = """SELECT * FROM network_slice_status"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command)
-        network_slice_status = cur.fetchall()
-        cur.close()
+        with get_cursor() as cur:
+            cur.execute(command)
+            network_slice_status = cur.fetchall()
 
         return network_slice_status
     except (Exception, DatabaseError) as error:
@@ -139,10 +214,9 @@ def get_network_slice_status_by_id(network_slice_id: str):
     # Retrieve network_slice_status entry by network_slice_id (PRIMARY KEY)
     command = """SELECT * FROM network_slice_status WHERE network_slice_id = (%s)"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (network_slice_id,))
-        network_slice_status = cur.fetchone()
-        cur.close()
+        with get_cursor() as cur:
+            cur.execute(command, (network_slice_id,))
+            network_slice_status = cur.fetchone()
 
         if network_slice_status is None:
             raise NotExistingEntityException('network_slice_status with ID ' + network_slice_id + ' not found.')
@@ -157,10 +231,8 @@ def delete_network_slice_status_by_id(network_slice_id: str):
     # Delete network_slice_status entry by network_slice_id (PRIMARY KEY)
     command = """DELETE FROM network_slice_status WHERE network_slice_id = (%s)"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (network_slice_id,))
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (network_slice_id,))
 
         db_log.info('Removed network_slice_status %s', network_slice_id)
     except DatabaseError as error:
@@ -175,11 +247,9 @@ def insert_va_status(vertical_application_slice_status: str, intent):
     VALUES (%s, %s) RETURNING vertical_application_slice_id
     """
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (vertical_application_slice_status, json.dumps(intent)))
-        va_status_id = cur.fetchone()[0]
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (vertical_application_slice_status, json.dumps(intent)))
+            va_status_id = cur.fetchone()[0]
 
         db_log.info('Created new va_status with ID %s', va_status_id)
 
@@ -191,10 +261,8 @@ def insert_va_status(vertical_application_slice_status: str, intent):
 
 def execute_va_status_update(command: str, vertical_application_slice_id: str, update: str):
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (update, vertical_application_slice_id))
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (update, vertical_application_slice_id))
 
         db_log.info('Updated va_status %s', vertical_application_slice_id)
     except (Exception, DatabaseError) as error:
@@ -233,10 +301,8 @@ def update_va_with_status_by_network_slice(network_slice_id: str, vertical_appli
     WHERE network_slice_status = %s
     """
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (vertical_application_slice_status, network_slice_id))
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (vertical_application_slice_status, network_slice_id))
 
         db_log.info('Updated va_status with network_slice_status %s', network_slice_id)
     except (Exception, DatabaseError) as error:
@@ -248,10 +314,9 @@ def get_va_status():
     # Retrieve all va_status entries from the DB
     command = """SELECT * FROM vertical_application_slice_status"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command)
-        va_status = cur.fetchall()
-        cur.close()
+        with get_cursor() as cur:
+            cur.execute(command)
+            va_status = cur.fetchall()
 
         return va_status
     except (Exception, DatabaseError) as error:
@@ -263,10 +328,9 @@ def get_va_status_by_id(vertical_application_slice_id: str):
     # Retrieve va_status entry by vertical_application_slice_id (PRIMARY KEY)
     command = """SELECT * FROM vertical_application_slice_status WHERE vertical_application_slice_id = (%s)"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (vertical_application_slice_id,))
-        va_status = cur.fetchone()
-        cur.close()
+        with get_cursor() as cur:
+            cur.execute(command, (vertical_application_slice_id,))
+            va_status = cur.fetchone()
 
         if va_status is None:
             raise NotExistingEntityException('va_status with ID ' + vertical_application_slice_id + ' not found.')
@@ -281,10 +345,9 @@ def get_va_status_by_network_slice(network_slice_id: str):
     # Retrieve va_status entry by network slice id
     command = """SELECT * FROM vertical_application_slice_status WHERE network_slice_status = %s"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (network_slice_id,))
-        va_status = cur.fetchone()
-        cur.close()
+        with get_cursor() as cur:
+            cur.execute(command, (network_slice_id,))
+            va_status = cur.fetchone()
 
         if va_status is None:
             raise NotExistingEntityException('va_status with network slice ID ' + network_slice_id + ' not found.')
@@ -295,14 +358,146 @@ def get_va_status_by_network_slice(network_slice_id: str):
         raise DBException('Error while fetching vertical_application_slice_status: ' + str(error))
 
 
+# Build the vas_info model of each vertical application slice in a single round trip, joining
+# the network_slice_status and aggregating the kubeconfigs of its vertical_application_quota_status
+va_info_query = """
+SELECT json_build_object(
+    'vasStatus', json_build_object(
+        'vasi', vas.vertical_application_slice_id,
+        'status', vas.vertical_application_slice_status
+    ),
+    'vaQuotaInfo', COALESCE(vaq.kubeconfigs, '[]'::json),
+    'networkSliceStatus', json_build_object(
+        'networkSliceId', ns.network_slice_id,
+        'status', ns.network_slice_status
+    ),
+    'vasConfiguration', vas.intent,
+    'nestId', vas.nest_id
+)
+FROM vertical_application_slice_status vas
+LEFT JOIN network_slice_status ns ON ns.network_slice_id = vas.network_slice_status
+LEFT JOIN LATERAL (
+    SELECT json_agg(q.vertical_application_quota_kubeconfig) AS kubeconfigs
+    FROM vertical_application_quota_status q
+    WHERE q.vertical_application_slice_id = vas.vertical_application_slice_id
+) vaq ON TRUE
+"""
+
+
+def build_va_info_command(limit: int = None, after: str = None, status: str = None,
+                          nest_id: str = None, network_slice_id: str = None,
+                          geographical_area_id: str = None, slice_type: str = None):
+    # Build the vas_info query of the vertical application slices matching the given filters,
+    # ordered by vertical_application_slice_id. Pagination is keyset based: at most limit
+    # entries are returned, starting right after the vertical_application_slice_id after
+    conditions = []
+    params = []
+    if after is not None:
+        conditions.append('vas.vertical_application_slice_id > %s')
+        params.append(after)
+    if status is not None:
+        conditions.append('vas.vertical_application_slice_status = %s')
+        params.append(status)
+    if nest_id is not None:
+        conditions.append('vas.nest_id = %s')
+        params.append(nest_id)
+    if network_slice_id is not None:
+        conditions.append('vas.network_slice_status = %s')
+        params.append(network_slice_id)
+    # Filters on the intent fields are containment checks served by the GIN index on intent
+    if geographical_area_id is not None:
+        conditions.append('vas.intent @> %s::jsonb')
+        params.append(json.dumps({'locationConstraints': [{'geographicalAreaId': geographical_area_id}]}))
+    if slice_type is not None:
+        conditions.append('vas.intent @> %s::jsonb')
+        params.append(json.dumps({'networkingConstraints': [{'sliceProfiles': [{'sliceType': slice_type}]}]}))
+
+    command = va_info_query
+    if len(conditions) > 0:
+        command += 'WHERE ' + ' AND '.join(conditions) + '\n'
+    command += 'ORDER BY vas.vertical_application_slice_id\n'
+    if limit is not None:
+        command += 'LIMIT %s'
+        params.append(limit)
+
+    return command, params
+
+
+def get_va_info(limit: int = None, after: str = None, status: str = None,
+                nest_id: str = None, network_slice_id: str = None,
+                geographical_area_id: str = None, slice_type: str = None):
+    # Retrieve the vas_info of the vertical application slices matching the given filters
+    command, params = build_va_info_command(limit, after, status, nest_id, network_slice_id,
+                                            geographical_area_id, slice_type)
+    try:
+        with get_cursor() as cur:
+            cur.execute(command, params)
+            va_info = [row[0] for row in cur.fetchall()]
+
+        return va_info
+    except (Exception, DatabaseError) as error:
+        db_log.error(str(error))
+        raise DBException('Error while fetching vertical_application_slice_status: ' + str(error))
+
+
+def stream_va_info(limit: int = None, after: str = None, status: str = None,
+                   nest_id: str = None, network_slice_id: str = None,
+                   geographical_area_id: str = None, slice_type: str = None,
+                   batch_size: int = stream_batch_size):
+    # Yield the vas_info of the vertical application slices matching the given filters one by one,
+    # reading them from a server-side cursor batch_size rows at a time
+    command, params = build_va_info_command(limit, after, status, nest_id, network_slice_id,
+                                            geographical_area_id, slice_type)
+    try:
+        with get_cursor(name='stream_va_info', batch_size=batch_size) as cur:
+            cur.execute(command, params)
+            for row in cur:
+                yield row[0]
+    except (Exception, DatabaseError) as error:
+        db_log.error(str(error))
+        raise DBException('Error while fetching vertical_application_slice_status: ' + str(error))
+
+
+def get_va_info_by_id(vertical_application_slice_id: str):
+    # Retrieve the vas_info by vertical_application_slice_id (PRIMARY KEY)
+    command = va_info_query + """WHERE vas.vertical_application_slice_id = %s"""
+    try:
+        with get_cursor() as cur:
+            cur.execute(command, (vertical_application_slice_id,))
+            va_info = cur.fetchone()
+
+        if va_info is None:
+            raise NotExistingEntityException('va_status with ID ' + vertical_application_slice_id + ' not found.')
+
+        return va_info[0]
+    except DatabaseError as error:
+        db_log.error(str(error))
+        raise DBException('Error while fetching vertical_application_slice_status: ' + str(error))
+
+
+def get_va_info_by_network_slice(network_slice_id: str):
+    # Retrieve the vas_info by network slice id
+    command = va_info_query + """WHERE vas.network_slice_status = %s"""
+    try:
+        with get_cursor() as cur:
+            cur.execute(command, (network_slice_id,))
+            va_info = cur.fetchone()
+
+        if va_info is None:
+            raise NotExistingEntityException('va_status with network slice ID ' + network_slice_id + ' not found.')
+
+        return va_info[0]
+    except DatabaseError as error:
+        db_log.error(str(error))
+        raise DBException('Error while fetching vertical_application_slice_status: ' + str(error))
+
+
 def delete_va_status_by_id(vertical_application_slice_id: str):
     # Delete va_status entry by vertical_application_slice_id (PRIMARY KEY)
     command = """DELETE FROM vertical_application_slice_status WHERE vertical_application_slice_id = (%s)"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (vertical_application_slice_id,))
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (vertical_application_slice_id,))
 
         db_log.info('Removed vertical_application_slice_status %s', vertical_application_slice_id)
     except DatabaseError as error:
@@ -317,11 +512,9 @@ def insert_cluster_node(cluster_node: dict, cluster_id: str):
     VALUES (%s, %s, %s) RETURNING cluster_node_id
     """
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (cluster_node['name'], json.dumps(cluster_node['labels']), cluster_id))
-        cluster_node_id = cur.fetchone()[0]
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (cluster_node['name'], json.dumps(cluster_node['labels']), cluster_id))
+            cluster_node_id = cur.fetchone()[0]
 
         db_log.info('Created new cluster_node with ID %s', cluster_node_id)
 
@@ -331,14 +524,34 @@ def insert_cluster_node(cluster_node: dict, cluster_id: str):
         raise DBException('Error while creating cluster_node: ' + str(error))
 
 
+def insert_cluster_nodes(cluster_nodes: list, cluster_id: str):
+    # Create the entries <uuid, name, labels, cluster_id> of all the given nodes with a multi-row INSERT
+    command = """INSERT INTO cluster_nodes(name, labels, cluster_id) VALUES %s RETURNING cluster_node_id"""
+    if len(cluster_nodes) == 0:
+        return []
+    try:
+        with get_cursor() as cur:
+            cluster_node_ids = execute_values(cur, command, [
+                (cluster_node['name'], json.dumps(cluster_node['labels']), cluster_id)
+                for cluster_node in cluster_nodes
+            ], fetch=True)
+
+        cluster_node_ids = [cluster_node_id[0] for cluster_node_id in cluster_node_ids]
+        db_log.info('Created %s new cluster_nodes for cluster_id %s', len(cluster_node_ids), cluster_id)
+
+        return cluster_node_ids
+    except (Exception, DatabaseError) as error:
+        db_log.error(str(error))
+        raise DBException('Error while creating cluster_nodes: ' + str(error))
+
+
 def get_cluster_nodes():
     # Retrieve all the cluster_nodes entries from the DB
     command = """SELECT * FROM cluster_nodes"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command)
-        cluster_nodes = cur.fetchall()
-        cur.close()
+        with get_cursor() as cur:
+            cur.execute(command)
+            cluster_nodes = cur.fetchall()
 
         return cluster_nodes
     except (Exception, DatabaseError) as error:
@@ -350,10 +563,9 @@ def get_cluster_nodes_by_cluster_id(cluster_id: str):
     # Retrieve all cluster_nodes linked to the given cluster_id
     command = """SELECT * FROM cluster_nodes WHERE cluster_id = %s"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (cluster_id,))
-        cluster_nodes = cur.fetchall()
-        cur.close()
+        with get_cursor() as cur:
+            cur.execute(command, (cluster_id,))
+            cluster_nodes = cur.fetchall()
 
         return cluster_nodes
     except DatabaseError as error:
@@ -366,10 +578,8 @@ def update_cluster_node(cluster_node_id: str, cluster_node: dict):
     command = """UPDATE cluster_nodes SET name = %s, labels = %s WHERE cluster_node_id = %s
     """
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (cluster_node['name'], cluster_node['labels'], cluster_node_id))
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (cluster_node['name'], json.dumps(cluster_node['labels']), cluster_node_id))
 
         db_log.info('Updated cluster_node %s', cluster_node_id)
     except (Exception, DatabaseError) as error:
@@ -381,10 +591,8 @@ def delete_cluster_node(cluster_node_id: str):
     # Delete cluster_node by cluster_node_id
     command = """DELETE FROM cluster_nodes WHERE cluster_node_id = %s"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (cluster_node_id,))
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (cluster_node_id,))
 
         db_log.info('Removed cluster_node %s', cluster_node_id)
     except (Exception, DatabaseError) as error:
@@ -396,10 +604,8 @@ def delete_cluster_node_by_cluster_id(cluster_id: str):
     # Delete cluster_node by cluster_id
     command = """DELETE FROM cluster_nodes WHERE cluster_id = %s"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (cluster_id,))
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (cluster_id,))
 
         db_log.info('Removed cluster_nodes for cluster_id %s', cluster_id)
     except (Exception, DatabaseError) as error:
@@ -413,11 +619,9 @@ def insert_cluster(cluster: dict):
     INSERT INTO clusters(name, type) VALUES (%s, %s) RETURNING cluster_id
     """
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (cluster['name'], cluster['type']))
-        cluster_id = cur.fetchone()[0]
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (cluster['name'], cluster['type']))
+            cluster_id = cur.fetchone()[0]
 
         db_log.info('Created new cluster with ID %s', cluster_id)
 
@@ -431,10 +635,9 @@ def get_clusters():
     # Retrieve all the cluster entries from the DB
     command = """SELECT * FROM clusters"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command)
-        clusters = cur.fetchall()
-        cur.close()
+        with get_cursor() as cur:
+            cur.execute(command)
+            clusters = cur.fetchall()
 
         return clusters
     except (Exception, DatabaseError) as error:
@@ -446,10 +649,9 @@ def get_cluster_by_id(cluster_id: str):
     # Retrieve cluster entry by cluster_id (PRIMARY KEY)
     command = """SELECT * FROM clusters WHERE cluster_id = (%s)"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (cluster_id,))
-        cluster = cur.fetchone()
-        cur.close()
+        with get_cursor() as cur:
+            cur.execute(command, (cluster_id,))
+            cluster = cur.fetchone()
 
         if cluster is None:
             raise NotExistingEntityException('cluster with ID ' + cluster_id + ' not found.')
@@ -465,10 +667,8 @@ def update_cluster(cluster_id: str, cluster: dict):
     command = """UPDATE clusters SET name = %s, type = %s WHERE cluster_id = %s
     """
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (cluster['name'], cluster['type'], cluster_id))
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (cluster['name'], cluster['type'], cluster_id))
 
         db_log.info('Updated cluster %s', cluster_id)
     except (Exception, DatabaseError) as error:
@@ -480,10 +680,8 @@ def delete_cluster(cluster_id: str):
     # Delete cluster by cluster_id
     command = """DELETE FROM clusters WHERE cluster_id = %s"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (cluster_id,))
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (cluster_id,))
 
         db_log.info('Removed cluster %s', cluster_id)
     except (Exception, DatabaseError) as error:
@@ -498,13 +696,11 @@ def insert_location(location: dict, cluster_id: str):
     VALUES (%s, %s, %s, %s, %s, %s) RETURNING geographical_area_id
     """
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (location['locationName'], cluster_id,
-                              location['latitude'], location['longitude'],
-                              location['coverageRadius'], location['segment']))
-        geographical_area_id = cur.fetchone()[0]
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (location['locationName'], cluster_id,
+                                  location['latitude'], location['longitude'],
+                                  location['coverageRadius'], location['segment']))
+            geographical_area_id = cur.fetchone()[0]
 
         db_log.info('Created new location with ID %s', geographical_area_id)
 
@@ -514,14 +710,53 @@ def insert_location(location: dict, cluster_id: str):
         raise DBException('Error while creating location: ' + str(error))
 
 
+def insert_locations(locations: list):
+    # Create the entries of all the given locations with their cluster and cluster nodes using one
+    # multi-row INSERT per table. The UUIDs are generated here to link the rows without RETURNING
+    cluster_values = []
+    cluster_node_values = []
+    location_values = []
+    for location in locations:
+        cluster_id = str(uuid.uuid4())
+        geographical_area_id = str(uuid.uuid4())
+        cluster = location['cluster']
+
+        cluster_values.append((cluster_id, cluster['name'], cluster['type']))
+        for cluster_node in cluster['nodes']:
+            cluster_node_values.append((cluster_node['name'], json.dumps(cluster_node['labels']), cluster_id))
+        location_values.append((geographical_area_id, location['locationName'], cluster_id,
+                                location['latitude'], location['longitude'],
+                                location['coverageRadius'], location['segment']))
+
+    if len(location_values) == 0:
+        return []
+    try:
+        with get_cursor() as cur:
+            execute_values(cur, """INSERT INTO clusters(cluster_id, name, type) VALUES %s""", cluster_values)
+            if len(cluster_node_values) > 0:
+                execute_values(cur, """INSERT INTO cluster_nodes(name, labels, cluster_id) VALUES %s""",
+                               cluster_node_values)
+            execute_values(cur, """
+            INSERT INTO locations(geographical_area_id, location_name, cluster_id,
+            latitude, longitude, coverage_radius, segment) VALUES %s
+            """, location_values)
+
+        geographical_area_ids = [location_value[0] for location_value in location_values]
+        db_log.info('Created %s new locations', len(geographical_area_ids))
+
+        return geographical_area_ids
+    except (Exception, DatabaseError) as error:
+        db_log.error(str(error))
+        raise DBException('Error while creating locations: ' + str(error))
+
+
 def get_locations():
     # Retrieve all the location entries from the DB
     command = """SELECT * FROM locations"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command)
-        locations = cur.fetchall()
-        cur.close()
+        with get_cursor() as cur:
+            cur.execute(command)
+            locations = cur.fetchall()
 
         return locations
     except (Exception, DatabaseError) as error:
@@ -533,10 +768,9 @@ def get_location_by_id(geographical_area_id: str):
     # Retrieve location entry by geographical_area_id (PRIMARY KEY)
     command = """SELECT * FROM locations WHERE geographical_area_id = (%s)"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (geographical_area_id,))
-        location = cur.fetchone()
-        cur.close()
+        with get_cursor() as cur:
+            cur.execute(command, (geographical_area_id,))
+            location = cur.fetchone()
 
         if location is None:
             raise NotExistingEntityException('location with ID ' + geographical_area_id + ' not found.')
@@ -547,18 +781,92 @@ def get_location_by_id(geographical_area_id: str):
         raise DBException('Error while fetching location: ' + str(error))
 
 
+# Build the geographical_area model of each location in a single round trip,
+# joining its cluster and aggregating the cluster_nodes of the cluster
+location_info_query = """
+SELECT json_build_object(
+    'geographicalAreaId', l.geographical_area_id,
+    'locationName', l.location_name,
+    'cluster', json_build_object(
+        'name', c.name,
+        'type', c.type,
+        'nodes', COALESCE(cn.nodes, '[]'::json)
+    ),
+    'latitude', l.latitude,
+    'longitude', l.longitude,
+    'coverageRadius', l.coverage_radius,
+    'segment', l.segment
+)
+FROM locations l
+JOIN clusters c ON c.cluster_id = l.cluster_id
+LEFT JOIN LATERAL (
+    SELECT json_agg(json_build_object('name', n.name, 'labels', n.labels)) AS nodes
+    FROM cluster_nodes n
+    WHERE n.cluster_id = l.cluster_id
+) cn ON TRUE
+"""
+
+
+def build_location_info_command(geographical_area_ids=None, node_labels: dict = None):
+    # Build the geographical_area query of all the locations, or only of the locations whose
+    # geographical_area_id is in geographical_area_ids and/or whose cluster has at least one node
+    # with all the given node_labels (containment check served by the GIN index on labels)
+    conditions = []
+    params = []
+    if geographical_area_ids is not None:
+        conditions.append('l.geographical_area_id = ANY(%s::uuid[])')
+        params.append(list(geographical_area_ids))
+    if node_labels is not None:
+        conditions.append('EXISTS (SELECT 1 FROM cluster_nodes ln '
+                          'WHERE ln.cluster_id = l.cluster_id AND ln.labels @> %s::jsonb)')
+        params.append(json.dumps(node_labels))
+
+    command = location_info_query
+    if len(conditions) > 0:
+        command += 'WHERE ' + ' AND '.join(conditions) + '\n'
+    command += 'ORDER BY l.geographical_area_id'
+
+    return command, params
+
+
+def get_location_info(geographical_area_ids=None, node_labels: dict = None):
+    # Retrieve the geographical_area of the locations matching the given filters
+    command, params = build_location_info_command(geographical_area_ids, node_labels)
+    try:
+        with get_cursor() as cur:
+            cur.execute(command, params)
+            location_info = [row[0] for row in cur.fetchall()]
+
+        return location_info
+    except (Exception, DatabaseError) as error:
+        db_log.error(str(error))
+        raise DBException('Error while fetching locations: ' + str(error))
+
+
+def stream_location_info(geographical_area_ids=None, node_labels: dict = None, batch_size: int = stream_batch_size):
+    # Yield the geographical_area of the locations matching the given filters one
+    # by one, reading them from a server-side cursor batch_size rows at a time
+    command, params = build_location_info_command(geographical_area_ids, node_labels)
+    try:
+        with get_cursor(name='stream_location_info', batch_size=batch_size) as cur:
+            cur.execute(command, params)
+            for row in cur:
+                yield row[0]
+    except (Exception, DatabaseError) as error:
+        db_log.error(str(error))
+        raise DBException('Error while fetching locations: ' + str(error))
+
+
 def update_location(geographical_area_id: str, location: dict):
     # Update a location entry in the DB
     command = """UPDATE locations SET location_name = %s, latitude = %s, longitude = %s,
     coverage_radius = %s, segment = %s WHERE geographical_area_id = %s
     """
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (location['locationName'], location['latitude'],
-                              location['longitude'], location['coverageRadius'],
-                              location['segment'], geographical_area_id))
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (location['locationName'], location['latitude'],
+                                  location['longitude'], location['coverageRadius'],
+                                  location['segment'], geographical_area_id))
 
         db_log.info('Updated location %s', geographical_area_id)
     except (Exception, DatabaseError) as error:
@@ -570,10 +878,8 @@ def delete_location(geographical_area_id: str):
     # Delete location by geographical_area_id
     command = """DELETE FROM locations WHERE geographical_area_id = %s"""
     try:
-        cur = db_conn.cursor()
-        cur.execute(command, (geographical_area_id,))
-        cur.close()
-        db_conn.commit()
+        with get_cursor() as cur:
+            cur.execute(command, (geographical_area_id,))
 
         db_log.info('Removed location geographical_area_id %s', geographical_area_id)
     except (Exception, DatabaseError) as error:
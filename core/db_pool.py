@@ -0,0 +1,29 @@
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from threading import BoundedSemaphore
+
+
+class BlockingConnectionPool(ThreadedConnectionPool):
+    # ThreadedConnectionPool raising PoolError when exhausted: callers
+    # wait (up to timeout seconds) for a connection to be returned instead
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float = None, *args, **kwargs):
+        self._semaphore = BoundedSemaphore(maxconn)
+        self._timeout = timeout
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        if not self._semaphore.acquire(timeout=self._timeout):
+            raise PoolError('connection pool exhausted, no connection returned within ' +
+                            str(self._timeout) + 's')
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._semaphore.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            # Broken connections are discarded, the pool reopens them on demand
+            super().putconn(conn, key, close or conn.closed != 0)
+        finally:
+            self._semaphore.release()
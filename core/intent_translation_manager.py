@@ -1,27 +1,29 @@
-from core import nest_catalogue_url, qi
+from core import nest_selection_engine, nest_selection_cache_size, catalogue_log
+from core import nest_catalogue_manager
+from core import qi_manager
+from core.qi_table import QosIndicator
+from core.nest_index import NestIndex, IndexedNest
+from core.nest_columnar import ColumnarNests, numpy
 from core.enums import SliceType, IsolationLevel, IsolationLevelMapping
 from core.exceptions import FailedIntentTranslationException, NotImplementedException, MalformedIntentException
-from typing import List, Tuple
+from typing import List, Mapping, Tuple
+from collections import OrderedDict
+from threading import Lock
 from sys import maxsize
-import requests
 
 
-# Retrieve all the NESTs from the NEST Catalogue
+# Retrieve all the NESTs from the NEST Catalogue, served by the catalogue cache
 def get_nests() -> List[dict]:
-    try:
-        response = requests.get('http://' + nest_catalogue_url + '/ns/catalogue/nestemplate')
-    except requests.exceptions.RequestException as e:
-        raise FailedIntentTranslationException(str(e))
+    return nest_catalogue_manager.get_nests()
 
-    status_code = response.status_code
-    if status_code != 200:
-        raise FailedIntentTranslationException("NEST GET failed, status code: " + str(status_code))
 
-    return response.json()
+# Assign a Slice Type and the minimum delay to each NEST in the list received as input parameter,
+# according to the given QI table (by default the current one)
+def map_nests_to_slice_type(nests: List[dict],
+                            qi: Mapping[str, QosIndicator] = None) -> List[Tuple[dict, SliceType, int]]:
+    if qi is None:
+        qi = qi_manager.get_qi_table().indicators
 
-
-# Assign a Slice Type and the minimum delay to each NEST in the list received as input parameter
-def map_nests_to_slice_type(nests: List[dict]) -> List[Tuple[dict, SliceType, int]]:
     nest_slice_type_map = []
     for nest in nests:
         gst = nest.get('gst')
@@ -44,16 +46,15 @@ def map_nests_to_slice_type(nests: List[dict]) -> List[Tuple[dict, SliceType, in
             if qii is None:
                 continue
 
-            if qii[0] == SliceType.URLLC.name:
+            if qii.slice_type == SliceType.URLLC:
                 urllc += 1
-            elif qii[0] == SliceType.EMBB.name:
+            elif qii.slice_type == SliceType.EMBB:
                 embb += 1
             else:
                 continue
 
-            delay = int(qii[1])
-            if delay < min_delay:
-                min_delay = delay
+            if qii.delay < min_delay:
+                min_delay = qii.delay
 
         if urllc == 0 and embb == 0:
             continue
@@ -71,140 +72,141 @@ def map_nests_to_slice_type(nests: List[dict]) -> List[Tuple[dict, SliceType, in
     return nest_slice_type_map
 
 
-# Filter the <NEST, Slice Type> list received as input in a <NEST, Slice Type> list
-# containing only NEST with the specified Slice Type
-def filter_nest_slice_type_map(nest_slice_type_map: List[Tuple[dict, SliceType, int]],
-                               slice_type: SliceType) -> List[Tuple[dict, SliceType, int]]:
-    return [nest_slice_type for nest_slice_type in nest_slice_type_map if nest_slice_type[1].name == slice_type.name]
+# Selection index of the cached catalogue, rebuilt only when the catalogue or the QI table version changes.
+# The columnar engine is used if configured and numpy is installed
+nest_index = None
+nest_index_class = NestIndex
+if nest_selection_engine == 'numpy':
+    if numpy is not None:
+        nest_index_class = ColumnarNests
+    else:
+        catalogue_log.warning('numpy not installed, falling back to the index NEST selection engine')
 
 
-def filter_by_isolation_level(nest_slice_type_map: List[Tuple[dict, SliceType, int]],
-                              isolation_level: str) -> List[Tuple[dict, SliceType, int]]:
-    _nest_slice_type_map = []
-    for nest_slice_type in nest_slice_type_map:
-        gst = nest_slice_type[0].get('gst')
-        if gst is None:
-            continue
+def build_nest_index(catalogue: nest_catalogue_manager.Catalogue):
+    global nest_index
+    qi_table = qi_manager.get_qi_table()
+    version = (catalogue.version, qi_table.version)
+    current = nest_index
+    if current is None or current.version != version:
+        current = nest_index_class(version, map_nests_to_slice_type(catalogue.nests, qi_table.indicators))
+        nest_index = current
 
-        isolation = gst.get('isolation')
-        if isolation is None:
-            continue
+    return current
 
-        _isolation_level = isolation.get('isolationLevel')
-        if _isolation_level is None:
-            continue
 
-        if isolation_level == _isolation_level:
-            _nest_slice_type_map.append(nest_slice_type)
+def get_nest_index():
+    return build_nest_index(nest_catalogue_manager.get_catalogue())
 
-    return _nest_slice_type_map
 
+# The prefetcher builds the selection index of each new catalogue version off the request path
+nest_catalogue_manager.add_rebuild_hook(build_nest_index)
+nest_catalogue_manager.start_prefetcher()
 
-def filter_by_dl_throughput(nest_slice_type_map: List[Tuple[dict, SliceType, int]],
-                            dl_throughput: float) -> List[Tuple[dict, SliceType, int]]:
-    _nest_slice_type_map = []
-    for nest_slice_type in nest_slice_type_map:
-        gst = nest_slice_type[0].get('gst')
-        if gst is None:
-            continue
 
-        downlink_throughput_ns = gst.get('downlinkThroughputNS')
-        if downlink_throughput_ns is None:
-            continue
-
-        maximum_dl = downlink_throughput_ns.get('maximumDL')
-        if maximum_dl is None:
-            continue
+def get_headroom(nest: IndexedNest, max_delay: float = None,
+                 min_dl_throughput: float = None, min_ul_throughput: float = None) -> float:
+    # Sum of the relative spare capacity of the NEST on each requested constraint, 0 is an exact fit
+    headroom = 0.0
+    if max_delay is not None and 0 < max_delay < maxsize:
+        headroom += (max_delay - nest.min_delay) / max_delay
+    if min_dl_throughput is not None and min_dl_throughput > 0:
+        headroom += (nest.max_dl_throughput - min_dl_throughput) / min_dl_throughput
+    if min_ul_throughput is not None and min_ul_throughput > 0:
+        headroom += (nest.max_ul_throughput - min_ul_throughput) / min_ul_throughput
 
-        maximum_dl = float(maximum_dl)
-        if maximum_dl >= dl_throughput:
-            _nest_slice_type_map.append(nest_slice_type)
+    return headroom
 
-    return _nest_slice_type_map
 
+def rank_nests(slice_type: SliceType, isolation_level: str, max_delay: float = None, min_dl_throughput: float = None,
+               min_ul_throughput: float = None, index=None) -> List[Tuple[IndexedNest, float]]:
+    # Rank the NESTs satisfying the constraints with at least the requested isolation level by closeness of fit:
+    # first by isolation levels above the requested one, then by headroom, ties keep catalogue order. The score
+    # maps this order to (0, 1]: each isolation level above the requested one takes a band of 1 / levels, within
+    # which the fit 1 / (1 + headroom) places the NEST. 1 is an exact fit
+    if index is None:
+        index = get_nest_index()
+    requested_isolation = IsolationLevel[IsolationLevelMapping(isolation_level).name]
+    isolation_levels = len(IsolationLevel)
 
-def filter_by_ul_throughput(nest_slice_type_map: List[Tuple[dict, SliceType, int]],
-                            ul_throughput: float) -> List[Tuple[dict, SliceType, int]]:
-    _nest_slice_type_map = []
-    for nest_slice_type in nest_slice_type_map:
-        gst = nest_slice_type[0].get('gst')
-        if gst is None:
+    ranked = []
+    for _isolation_level in IsolationLevel:
+        if _isolation_level.value < requested_isolation.value:
             continue
 
-        uplink_throughput_ns = gst.get('uplinkThroughputNS')
-        if uplink_throughput_ns is None:
-            continue
+        isolation_delta = _isolation_level.value - requested_isolation.value
+        candidates = index.select(slice_type, IsolationLevelMapping[_isolation_level.name].value,
+                                  max_delay, min_dl_throughput, min_ul_throughput)
+        for candidate in candidates:
+            headroom = get_headroom(candidate, max_delay, min_dl_throughput, min_ul_throughput)
+            ranked.append((isolation_delta, headroom, candidate.position, candidate))
 
-        max_uplink_throughput = uplink_throughput_ns.get('maxUplinkThroughput')
-        if max_uplink_throughput is None:
-            continue
+    ranked.sort(key=lambda r: (r[0], r[1], r[2]))
 
-        max_uplink_throughput = float(max_uplink_throughput)
-        if max_uplink_throughput >= ul_throughput:
-            _nest_slice_type_map.append(nest_slice_type)
+    return [(candidate, (isolation_levels - 1 - isolation_delta + 1 / (1 + headroom)) / isolation_levels)
+            for isolation_delta, headroom, _, candidate in ranked]
 
-    return _nest_slice_type_map
 
+def rank_urllc_nests(delay: float, isolation_level: str, index=None) -> List[Tuple[IndexedNest, float]]:
+    return rank_nests(SliceType.URLLC, isolation_level, max_delay=delay, index=index)
 
-def select_urllc_nest(delay: float, isolation_level: str) -> dict:
-    nests = get_nests()
-    nest_slice_type_map = map_nests_to_slice_type(nests)
-    nest_slice_type_map = filter_nest_slice_type_map(nest_slice_type_map, SliceType.URLLC)
 
-    nest_slice_type_map = \
-        [nest_slice_type for nest_slice_type in nest_slice_type_map if float(nest_slice_type[2]) <= delay]
+def rank_embb_nests(isolation_level: str,
+                    dl_throughput: float,
+                    ul_throughput: float,
+                    index=None) -> List[Tuple[IndexedNest, float]]:
+    return rank_nests(SliceType.EMBB, isolation_level,
+                      min_dl_throughput=dl_throughput if dl_throughput != 0 else None,
+                      min_ul_throughput=ul_throughput if ul_throughput != 0 else None,
+                      index=index)
 
-    nest_slice_type_map = filter_by_isolation_level(nest_slice_type_map, isolation_level)
 
-    if len(nest_slice_type_map) == 0:
-        raise FailedIntentTranslationException('No URLLC NEST available with specified constraints.')
+def rank_mmtc_nests(isolation_level: str,
+                    dl_throughput: float,
+                    ul_throughput: float,
+                    index=None) -> List[Tuple[IndexedNest, float]]:
+    return rank_nests(SliceType.MMTC, isolation_level,
+                      min_dl_throughput=dl_throughput if dl_throughput != 0 else None,
+                      min_ul_throughput=ul_throughput if ul_throughput != 0 else None,
+                      index=index)
 
-    return nest_slice_type_map[0][0]
 
+def select_urllc_nest(delay: float, isolation_level: str, index=None) -> dict:
+    ranked = rank_urllc_nests(delay, isolation_level, index)
 
-def select_embb_nest(isolation_level: str,
-                     dl_throughput: float,
-                     ul_throughput: float) -> dict:
-    nests = get_nests()
-    nest_slice_type_map = map_nests_to_slice_type(nests)
-    nest_slice_type_map = filter_nest_slice_type_map(nest_slice_type_map, SliceType.EMBB)
+    if len(ranked) == 0:
+        raise FailedIntentTranslationException('No URLLC NEST available with specified constraints.')
 
-    nest_slice_type_map = filter_by_isolation_level(nest_slice_type_map, isolation_level)
+    return ranked[0][0].nest
 
-    if dl_throughput != 0:
-        nest_slice_type_map = filter_by_dl_throughput(nest_slice_type_map, dl_throughput)
 
-    if ul_throughput != 0:
-        nest_slice_type_map = filter_by_ul_throughput(nest_slice_type_map, ul_throughput)
+def select_embb_nest(isolation_level: str,
+                     dl_throughput: float,
+                     ul_throughput: float,
+                     index=None) -> dict:
+    ranked = rank_embb_nests(isolation_level, dl_throughput, ul_throughput, index)
 
-    if len(nest_slice_type_map) == 0:
+    if len(ranked) == 0:
         raise FailedIntentTranslationException('No EMBB NEST available with specified constraints.')
 
-    return nest_slice_type_map[0][0]
+    return ranked[0][0].nest
 
 
 def select_mmtc_nest(isolation_level: str,
                      dl_throughput: float,
-                     ul_throughput: float) -> dict:
-    nests = get_nests()
-    nest_slice_type_map = map_nests_to_slice_type(nests)
-    nest_slice_type_map = filter_nest_slice_type_map(nest_slice_type_map, SliceType.MMTC)
-
-    nest_slice_type_map = filter_by_isolation_level(nest_slice_type_map, isolation_level)
-
-    if dl_throughput != 0:
-        nest_slice_type_map = filter_by_dl_throughput(nest_slice_type_map, dl_throughput)
+                     ul_throughput: float,
+                     index=None) -> dict:
+    ranked = rank_mmtc_nests(isolation_level, dl_throughput, ul_throughput, index)
 
-    if ul_throughput != 0:
-        nest_slice_type_map = filter_by_ul_throughput(nest_slice_type_map, ul_throughput)
-
-    if len(nest_slice_type_map) == 0:
+    if len(ranked) == 0:
         raise FailedIntentTranslationException('No MMTC NEST available with specified constraints.')
 
-    return nest_slice_type_map[0][0]
+    return ranked[0][0].nest
 
 
-def select_nest(networking_constraints: List[dict]) -> str:
+# Reduce the networking constraints to the canonical fingerprint of what the NEST selection depends on:
+# <URLLC, min delay, isolation level> or <EMBB/MMTC, isolation level, max DL throughput, max UL throughput>
+def get_nest_fingerprint(networking_constraints: List[dict]) -> tuple:
     urllc = 0
     embb = 0
     mmtc = 0
@@ -275,12 +277,84 @@ def select_nest(networking_constraints: List[dict]) -> str:
     elif urllc == 0 and embb == 0 and mmtc == 0:
         raise MalformedIntentException('Malformed intent [networkingConstraints], abort')
     elif urllc > 0:
-        nest = select_urllc_nest(min_delay, IsolationLevelMapping[max_isolation_level.name].value)
+        return SliceType.URLLC, min_delay, IsolationLevelMapping[max_isolation_level.name].value
     elif embb > 0:
-        nest = select_embb_nest(IsolationLevelMapping[max_isolation_level.name].value,
-                                max_dl_throughput, max_ul_throughput)
+        return SliceType.EMBB, IsolationLevelMapping[max_isolation_level.name].value, \
+            max_dl_throughput, max_ul_throughput
+    else:
+        return SliceType.MMTC, IsolationLevelMapping[max_isolation_level.name].value, \
+            max_dl_throughput, max_ul_throughput
+
+
+def select_nest_by_fingerprint(fingerprint: tuple, index=None) -> str:
+    if fingerprint[0] == SliceType.URLLC:
+        nest = select_urllc_nest(*fingerprint[1:], index=index)
+    elif fingerprint[0] == SliceType.EMBB:
+        nest = select_embb_nest(*fingerprint[1:], index=index)
     else:
-        nest = select_mmtc_nest(IsolationLevelMapping[max_isolation_level.name].value,
-                                max_dl_throughput, max_ul_throughput)
+        nest = select_mmtc_nest(*fingerprint[1:], index=index)
 
     return nest['gst']['gstId']
+
+
+def rank_nests_by_fingerprint(fingerprint: tuple) -> List[Tuple[IndexedNest, float]]:
+    if fingerprint[0] == SliceType.URLLC:
+        return rank_urllc_nests(*fingerprint[1:])
+    elif fingerprint[0] == SliceType.EMBB:
+        return rank_embb_nests(*fingerprint[1:])
+    else:
+        return rank_mmtc_nests(*fingerprint[1:])
+
+
+def get_nest_candidates(networking_constraints: List[dict], k: int) -> List[dict]:
+    # Return the top k NESTs satisfying the networking constraints, best fit first, with their score
+    candidates = []
+    for candidate, score in rank_nests_by_fingerprint(get_nest_fingerprint(networking_constraints))[:k]:
+        candidates.append({
+            'nestId': candidate.nest['gst']['gstId'],
+            'score': score,
+            'sliceType': candidate.slice_type.name,
+            'isolationLevel': candidate.isolation_level,
+            'minDelay': candidate.min_delay,
+            'maximumDL': candidate.max_dl_throughput,
+            'maxUplinkThroughput': candidate.max_ul_throughput
+        })
+
+    return candidates
+
+
+# LRU cache of the selected gstId by fingerprint, emptied when the selection index changes
+# (new catalogue or QI table version) so that a cached gstId always comes from the current catalogue and QIs
+selection_cache = OrderedDict()
+selection_cache_version = None
+selection_cache_lock = Lock()
+
+
+def select_nest(networking_constraints: List[dict], index=None) -> str:
+    # Select the NEST from the given selection index, by default the one of the cached catalogue.
+    # A caller translating several intents passes the same index to all of them
+    global selection_cache_version
+    fingerprint = get_nest_fingerprint(networking_constraints)
+    if index is None:
+        index = get_nest_index()
+    version = index.version
+
+    with selection_cache_lock:
+        if selection_cache_version != version:
+            selection_cache.clear()
+            selection_cache_version = version
+
+        gst_id = selection_cache.get(fingerprint)
+        if gst_id is not None:
+            selection_cache.move_to_end(fingerprint)
+            return gst_id
+
+    gst_id = select_nest_by_fingerprint(fingerprint, index)
+
+    with selection_cache_lock:
+        if selection_cache_version == version and nest_selection_cache_size > 0:
+            selection_cache[fingerprint] = gst_id
+            while len(selection_cache) > nest_selection_cache_size:
+                selection_cache.popitem(last=False)
+
+    return gst_id
@@ -0,0 +1,69 @@
+from kubernetes import client
+from kubernetes.config.kube_config import ConfigException, KubeConfigLoader, KUBE_CONFIG_DEFAULT_LOCATION
+from core import quota_log
+from core import exceptions
+from threading import Lock
+from pathlib import Path
+import os
+import yaml
+
+# Only the first file is used if KUBECONFIG lists several ones
+kubeconfig_path = Path(KUBE_CONFIG_DEFAULT_LOCATION.split(os.pathsep)[0]).expanduser()
+
+# The kubeconfig parsed at its last modification time and the ApiClient of each context built from it.
+# On change of the kubeconfig the clients are replaced, not closed: requests in progress keep using them
+kubeconfig = None
+kubeconfig_mtime = None
+api_clients = {}
+api_clients_lock = Lock()
+
+
+def load_kubeconfig():
+    # Parse the kubeconfig again only if it was modified since the last time, must hold api_clients_lock
+    global kubeconfig, kubeconfig_mtime, api_clients
+    try:
+        mtime = kubeconfig_path.stat().st_mtime
+    except OSError:
+        mtime = None
+
+    if kubeconfig is not None and mtime == kubeconfig_mtime:
+        return
+
+    _kubeconfig = None
+    if mtime is not None:
+        try:
+            with kubeconfig_path.open() as f:
+                _kubeconfig = yaml.safe_load(f)
+        except (OSError, yaml.YAMLError) as e:
+            quota_log.error('Cannot load kubeconfig ' + str(kubeconfig_path) + ': ' + str(e))
+
+    kubeconfig = _kubeconfig if isinstance(_kubeconfig, dict) else {}
+    kubeconfig_mtime = mtime
+    api_clients = {}
+
+    quota_log.info('Loaded kubeconfig %s with %s context(s).', kubeconfig_path, len(kubeconfig.get('contexts') or []))
+
+
+def get_api_client(context: str) -> client.ApiClient:
+    # Return the long-lived, connection pooled ApiClient of the given context of the kubeconfig
+    with api_clients_lock:
+        load_kubeconfig()
+
+        api_client = api_clients.get(context)
+        if api_client is None:
+            configuration = client.Configuration()
+            try:
+                # Relative certificate, key and token paths of the kubeconfig resolve against its directory,
+                # as kubectl does: load_kube_config_from_dict would resolve them against the working directory
+                loader = KubeConfigLoader(config_dict=kubeconfig, active_context=context,
+                                          config_base_path=str(kubeconfig_path.parent))
+                loader.load_and_set(configuration)
+            except ConfigException:
+                # If the kubeconfig context is missing
+                quota_log.error('Missing context ' + context + ' in ' + str(kubeconfig_path) + ', abort.')
+                raise exceptions.MissingContextException('Missing context ' + context)
+
+            api_client = client.ApiClient(configuration)
+            api_clients[context] = api_client
+
+    return api_client
@@ -0,0 +1,116 @@
+from core import migration_log
+from core.db_manager import get_cursor
+from core.exceptions import DBException
+from psycopg2 import DatabaseError
+from pathlib import Path
+from typing import List, Tuple
+import argparse
+import re
+
+migrations_dir = Path(__file__).parent.resolve().joinpath('migrations')
+migration_pattern = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+# Arbitrary key of the advisory lock serializing concurrent migration runs
+migration_lock_id = 4242
+
+version_table_command = """
+CREATE TABLE IF NOT EXISTS schema_migrations(
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+)
+"""
+
+
+def get_migrations() -> List[Tuple[int, str, Path]]:
+    # List the <version, name, path> of the migration scripts ordered by version
+    migrations = []
+    for path in migrations_dir.iterdir():
+        match = migration_pattern.match(path.name)
+        if match is None:
+            continue
+        migrations.append((int(match.group(1)), match.group(2), path))
+
+    migrations.sort(key=lambda migration: migration[0])
+
+    versions = [migration[0] for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise DBException('Duplicated migration versions in ' + str(migrations_dir))
+
+    return migrations
+
+
+def get_applied_versions() -> List[int]:
+    # Retrieve the versions of the migrations already applied to the DB
+    try:
+        with get_cursor() as cur:
+            cur.execute('SELECT pg_advisory_xact_lock(%s)', (migration_lock_id,))
+            cur.execute(version_table_command)
+            cur.execute('SELECT version FROM schema_migrations ORDER BY version')
+            versions = [row[0] for row in cur.fetchall()]
+
+        return versions
+    except (Exception, DatabaseError) as error:
+        migration_log.error(str(error))
+        raise DBException('Error while fetching schema_migrations: ' + str(error))
+
+
+def apply_migration(version: int, name: str, path: Path) -> bool:
+    # Apply a migration script and record its version in a single transaction.
+    # The advisory lock makes a concurrent run wait and then skip the migration
+    try:
+        with get_cursor() as cur:
+            cur.execute('SELECT pg_advisory_xact_lock(%s)', (migration_lock_id,))
+            cur.execute('SELECT 1 FROM schema_migrations WHERE version = %s', (version,))
+            if cur.fetchone() is not None:
+                return False
+
+            cur.execute(path.read_text())
+            cur.execute('INSERT INTO schema_migrations(version, name) VALUES (%s, %s)', (version, name))
+
+        migration_log.info('Applied migration %04d_%s', version, name)
+
+        return True
+    except (Exception, DatabaseError) as error:
+        migration_log.error(str(error))
+        raise DBException('Error while applying migration ' + path.name + ': ' + str(error))
+
+
+def upgrade() -> int:
+    # Apply, in order, all the migrations not yet applied to the DB
+    applied_versions = set(get_applied_versions())
+
+    applied = 0
+    for version, name, path in get_migrations():
+        if version in applied_versions:
+            continue
+        if apply_migration(version, name, path):
+            applied += 1
+
+    migration_log.info('DB schema up to date, %s migration(s) applied', applied)
+
+    return applied
+
+
+def status() -> List[Tuple[int, str, bool]]:
+    # List the <version, name, applied> of all the migrations
+    applied_versions = set(get_applied_versions())
+
+    return [(version, name, version in applied_versions) for version, name, _ in get_migrations()]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Application-Aware NSM DB schema migrations.')
+    arg_parser.add_argument('command', choices=['upgrade', 'status'],
+                            help='upgrade: apply the pending migrations, status: list the migrations')
+    args = arg_parser.parse_args()
+
+    if args.command == 'upgrade':
+        upgrade()
+    else:
+        for version, name, applied in status():
+            print('%04d_%s %s' % (version, name, 'applied' if applied else 'pending'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+-- Tables previously created at import time by core/__init__.py, IF NOT EXISTS
+-- lets databases initialized before the migrations were introduced be adopted as is
+
+CREATE TABLE IF NOT EXISTS network_slice_status(
+    network_slice_id UUID PRIMARY KEY,
+    network_slice_status VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS vertical_application_slice_status(
+    vertical_application_slice_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    vertical_application_slice_status VARCHAR(255) NOT NULL,
+    network_slice_status UUID,
+    intent JSON NOT NULL,
+    nest_id VARCHAR(255),
+    FOREIGN KEY (network_slice_status)
+        REFERENCES network_slice_status (network_slice_id)
+        ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS vertical_application_quota_status(
+    vertical_application_quota_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    vertical_application_quota_kubeconfig JSON NOT NULL,
+    vertical_application_slice_id UUID NOT NULL,
+    FOREIGN KEY (vertical_application_slice_id)
+        REFERENCES vertical_application_slice_status (vertical_application_slice_id)
+        ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS clusters(
+    cluster_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    name VARCHAR(255),
+    type VARCHAR(255)
+);
+
+CREATE TABLE IF NOT EXISTS cluster_nodes(
+    cluster_node_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    name VARCHAR(255),
+    labels JSON NOT NULL,
+    cluster_id UUID NOT NULL,
+    FOREIGN KEY (cluster_id)
+        REFERENCES clusters (cluster_id)
+        ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS locations(
+    geographical_area_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    location_name VARCHAR(255),
+    cluster_id UUID NOT NULL,
+    latitude FLOAT(8),
+    longitude FLOAT(8),
+    coverage_radius FLOAT(8),
+    segment VARCHAR(255),
+    FOREIGN KEY (cluster_id)
+        REFERENCES clusters (cluster_id)
+        ON UPDATE CASCADE ON DELETE CASCADE
+);
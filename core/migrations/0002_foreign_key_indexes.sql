@@ -0,0 +1,14 @@
+-- Index the foreign keys filtered by the hot queries (quotas and network slice
+-- of a vertical application slice, nodes and locations of a cluster)
+
+CREATE INDEX IF NOT EXISTS vertical_application_quota_status_vas_id_idx
+    ON vertical_application_quota_status (vertical_application_slice_id);
+
+CREATE INDEX IF NOT EXISTS vertical_application_slice_status_network_slice_idx
+    ON vertical_application_slice_status (network_slice_status);
+
+CREATE INDEX IF NOT EXISTS cluster_nodes_cluster_id_idx
+    ON cluster_nodes (cluster_id);
+
+CREATE INDEX IF NOT EXISTS locations_cluster_id_idx
+    ON locations (cluster_id);
@@ -0,0 +1,20 @@
+-- Store intents, kubeconfigs and node labels as JSONB, parsed once on write and
+-- indexable with GIN for the containment (@>) lookups made by db_manager
+
+ALTER TABLE vertical_application_slice_status
+    ALTER COLUMN intent TYPE JSONB USING intent::jsonb;
+
+ALTER TABLE vertical_application_quota_status
+    ALTER COLUMN vertical_application_quota_kubeconfig TYPE JSONB USING vertical_application_quota_kubeconfig::jsonb;
+
+ALTER TABLE cluster_nodes
+    ALTER COLUMN labels TYPE JSONB USING labels::jsonb;
+
+CREATE INDEX IF NOT EXISTS vertical_application_slice_status_intent_idx
+    ON vertical_application_slice_status USING GIN (intent jsonb_path_ops);
+
+CREATE INDEX IF NOT EXISTS vertical_application_quota_status_kubeconfig_idx
+    ON vertical_application_quota_status USING GIN (vertical_application_quota_kubeconfig jsonb_path_ops);
+
+CREATE INDEX IF NOT EXISTS cluster_nodes_labels_idx
+    ON cluster_nodes USING GIN (labels jsonb_path_ops);
@@ -0,0 +1,18 @@
+-- No query filters the kubeconfigs by content, their GIN index only added write cost
+DROP INDEX IF EXISTS vertical_application_quota_status_kubeconfig_idx;
+
+-- Store the geographicalAreaIds of the intents in canonical UUID form (lowercase, hyphenated), as the
+-- instantiation now does, so that the containment filter on them matches whatever form was requested.
+-- Ids that are not UUIDs are left as they are
+UPDATE vertical_application_slice_status
+SET intent = jsonb_set(intent, '{locationConstraints}', (
+    SELECT jsonb_agg(
+        CASE WHEN location_constraint->>'geographicalAreaId' ~
+                  '^(\{[0-9a-fA-F]{4}(-?[0-9a-fA-F]{4}){7}\}|[0-9a-fA-F]{4}(-?[0-9a-fA-F]{4}){7})$'
+             THEN jsonb_set(location_constraint, '{geographicalAreaId}',
+                            to_jsonb(((location_constraint->>'geographicalAreaId')::uuid)::text))
+             ELSE location_constraint
+        END ORDER BY position)
+    FROM jsonb_array_elements(intent->'locationConstraints') WITH ORDINALITY AS t(location_constraint, position)))
+WHERE jsonb_typeof(intent->'locationConstraints') = 'array'
+  AND jsonb_array_length(intent->'locationConstraints') > 0;
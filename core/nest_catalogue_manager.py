@@ -0,0 +1,223 @@
+from core import nest_catalogue_url, nest_catalogue_cache_ttl, nest_catalogue_cache_stale_ttl, \
+    nest_catalogue_timeout, nest_catalogue_prefetch_interval, catalogue_log
+from core.exceptions import FailedIntentTranslationException
+from concurrent.futures import Future
+from typing import Callable, List, NamedTuple, Optional
+from threading import Lock, Thread
+from datetime import datetime, timezone
+from hashlib import sha256
+import time
+import requests
+
+
+class Catalogue(NamedTuple):
+    nests: Optional[List[dict]]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    digest: Optional[str]
+    fetched_at: float
+    version: int
+
+
+# The cached catalogue is immutable and swapped as a whole, so readers never need the lock.
+# The lock only guards the swap and the fetch in progress, never held while fetching
+catalogue = Catalogue(None, None, None, None, 0.0, 0)
+catalogue_lock = Lock()
+inflight: Optional[Future] = None
+revalidating = False
+revalidating_lock = Lock()
+
+stats = {
+    'hits': 0,
+    'staleHits': 0,
+    'misses': 0,
+    'notModified': 0,
+    'unchanged': 0,
+    'errors': 0,
+    'lastRefresh': None,
+    'rebuildDuration': None
+}
+stats_lock = Lock()
+
+# Functions rebuilding, from a new catalogue version, the structures derived from it
+rebuild_hooks: List[Callable[[Catalogue], object]] = []
+prefetching = False
+
+
+def count(stat: str):
+    with stats_lock:
+        stats[stat] += 1
+
+
+def fetch_nests(current: Catalogue) -> Catalogue:
+    # GET the NEST Catalogue, conditional on the validators of the current copy when available
+    headers = {}
+    if current.nests is not None:
+        if current.etag is not None:
+            headers['If-None-Match'] = current.etag
+        if current.last_modified is not None:
+            headers['If-Modified-Since'] = current.last_modified
+
+    try:
+        response = requests.get('http://' + nest_catalogue_url + '/ns/catalogue/nestemplate', headers=headers,
+                                timeout=nest_catalogue_timeout)
+    except requests.exceptions.RequestException as e:
+        raise FailedIntentTranslationException(str(e))
+
+    status_code = response.status_code
+    if status_code == 304 and current.nests is not None:
+        count('notModified')
+        return current._replace(fetched_at=time.monotonic())
+    if status_code != 200:
+        raise FailedIntentTranslationException("NEST GET failed, status code: " + str(status_code))
+
+    # A payload identical to the cached one (e.g. a server without validators) keeps the version
+    digest = sha256(response.content).hexdigest()
+    if digest == current.digest and current.nests is not None:
+        count('unchanged')
+        return current._replace(etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'),
+                                fetched_at=time.monotonic())
+
+    return Catalogue(response.json(), response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                     digest, time.monotonic(), current.version + 1)
+
+
+def refresh(seen: Catalogue = None) -> Catalogue:
+    # Fetch the catalogue and swap it in. Concurrent refreshes share a single fetch, done outside
+    # the lock by the first caller while the others wait for its result. If the cached copy was
+    # already replaced since the caller saw it, that copy is returned
+    global catalogue, inflight
+    with catalogue_lock:
+        if seen is not None and catalogue is not seen and catalogue.nests is not None:
+            return catalogue
+        future = inflight
+        if future is None:
+            future = inflight = Future()
+            base = catalogue
+        else:
+            base = None
+
+    if base is None:
+        return future.result()
+
+    try:
+        fetched = fetch_nests(base)
+    except Exception as e:
+        # Also release the waiting callers on an unexpected error, e.g. a malformed payload
+        count('errors')
+        with catalogue_lock:
+            inflight = None
+        future.set_exception(e)
+        raise
+
+    with catalogue_lock:
+        # Invalidated while fetching: the fetched copy replaces the dropped one with a new version
+        if catalogue is not base:
+            fetched = fetched._replace(version=catalogue.version + 1)
+        catalogue = fetched
+        inflight = None
+    future.set_result(fetched)
+
+    return fetched
+
+
+def revalidate():
+    global revalidating
+    try:
+        refresh()
+    except FailedIntentTranslationException as e:
+        catalogue_log.warning('NEST Catalogue revalidation failed, still serving the cached copy: %s', str(e))
+    finally:
+        revalidating = False
+
+
+def get_catalogue() -> Catalogue:
+    # Return the cached catalogue while fresh. Once older than the TTL it is still returned, for
+    # at most the stale TTL, while a background thread revalidates it; after that it is refetched.
+    # When the prefetcher runs, the cached catalogue is always returned and only fetched if missing
+    global revalidating
+    current = catalogue
+    age = time.monotonic() - current.fetched_at
+
+    if current.nests is not None and (prefetching or age < nest_catalogue_cache_ttl):
+        count('hits')
+        return current
+
+    if current.nests is not None and age < nest_catalogue_cache_ttl + nest_catalogue_cache_stale_ttl:
+        count('staleHits')
+        with revalidating_lock:
+            start = not revalidating
+            revalidating = True
+        if start:
+            Thread(target=revalidate, daemon=True).start()
+        return current
+
+    count('misses')
+    return refresh(current)
+
+
+def add_rebuild_hook(hook: Callable[[Catalogue], object]):
+    rebuild_hooks.append(hook)
+
+
+def prefetch():
+    # Refresh the catalogue every prefetch interval and, only when its content changed, run the
+    # rebuild hooks so that requests always find the derived structures already built
+    rebuilt_version = None
+    while True:
+        try:
+            current = refresh()
+            if current.version != rebuilt_version:
+                start = time.monotonic()
+                for hook in rebuild_hooks:
+                    hook(current)
+                rebuild_duration = time.monotonic() - start
+                with stats_lock:
+                    stats['rebuildDuration'] = rebuild_duration
+                rebuilt_version = current.version
+
+                catalogue_log.info('NEST Catalogue version %s prefetched, %s NESTs, rebuilt in %.3fs',
+                                   current.version, len(current.nests), rebuild_duration)
+            with stats_lock:
+                stats['lastRefresh'] = datetime.now(timezone.utc)
+        except FailedIntentTranslationException as e:
+            catalogue_log.warning('NEST Catalogue prefetch failed, still serving the cached copy: %s', str(e))
+        except Exception as e:
+            catalogue_log.error('NEST Catalogue prefetch failed: %s', str(e))
+
+        time.sleep(nest_catalogue_prefetch_interval)
+
+
+def start_prefetcher():
+    # Start the background prefetcher, if enabled and not yet started
+    global prefetching
+    if nest_catalogue_prefetch_interval <= 0 or prefetching:
+        return
+
+    prefetching = True
+    Thread(target=prefetch, daemon=True).start()
+
+
+def get_nests() -> List[dict]:
+    return get_catalogue().nests
+
+
+def invalidate():
+    # Drop the cached catalogue, the next request fetches it again unconditionally
+    global catalogue
+    with catalogue_lock:
+        catalogue = Catalogue(None, None, None, None, 0.0, catalogue.version + 1)
+
+    catalogue_log.info('NEST Catalogue cache invalidated')
+
+
+def get_stats() -> dict:
+    current = catalogue
+    with stats_lock:
+        _stats = dict(stats)
+
+    return dict(_stats,
+                prefetching=prefetching,
+                version=current.version,
+                size=len(current.nests) if current.nests is not None else 0,
+                age=time.monotonic() - current.fetched_at if current.nests is not None else None)
@@ -0,0 +1,56 @@
+from core.enums import SliceType
+from core.nest_index import IndexedNest, build_indexed_nests
+from typing import List, Tuple
+
+# NumPy is optional, only needed by the columnar selection engine
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class ColumnarNests:
+    # Columnar representation of a catalogue version: one NumPy array per selection
+    # attribute, the selection is a boolean mask over the arrays instead of a Python loop
+
+    def __init__(self, version, nest_slice_type_map: List[Tuple[dict, SliceType, int]]):
+        if numpy is None:
+            raise ImportError('numpy is required by the columnar NEST selection engine')
+
+        self.version = version
+        self.nests = build_indexed_nests(nest_slice_type_map)
+
+        # Isolation levels are coded by order of appearance, requested levels never seen match nothing
+        self.isolation_codes = {}
+        for nest in self.nests:
+            self.isolation_codes.setdefault(nest.isolation_level, len(self.isolation_codes))
+
+        self.slice_type = numpy.fromiter((nest.slice_type.value for nest in self.nests),
+                                         dtype=numpy.int8, count=len(self.nests))
+        self.isolation = numpy.fromiter((self.isolation_codes[nest.isolation_level] for nest in self.nests),
+                                        dtype=numpy.int32, count=len(self.nests))
+        self.min_delay = numpy.fromiter((nest.min_delay for nest in self.nests),
+                                        dtype=numpy.float64, count=len(self.nests))
+        # Missing throughputs are NaN, which never satisfies a >= comparison
+        self.max_dl_throughput = numpy.fromiter(
+            (numpy.nan if nest.max_dl_throughput is None else nest.max_dl_throughput for nest in self.nests),
+            dtype=numpy.float64, count=len(self.nests))
+        self.max_ul_throughput = numpy.fromiter(
+            (numpy.nan if nest.max_ul_throughput is None else nest.max_ul_throughput for nest in self.nests),
+            dtype=numpy.float64, count=len(self.nests))
+
+    def select(self, slice_type: SliceType, isolation_level: str, max_delay: float = None,
+               min_dl_throughput: float = None, min_ul_throughput: float = None) -> List[IndexedNest]:
+        isolation_code = self.isolation_codes.get(isolation_level)
+        if isolation_code is None:
+            return []
+
+        mask = (self.slice_type == slice_type.value) & (self.isolation == isolation_code)
+        if max_delay is not None:
+            mask &= self.min_delay <= max_delay
+        if min_dl_throughput is not None:
+            mask &= self.max_dl_throughput >= min_dl_throughput
+        if min_ul_throughput is not None:
+            mask &= self.max_ul_throughput >= min_ul_throughput
+
+        return [self.nests[i] for i in numpy.flatnonzero(mask)]
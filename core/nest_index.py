@@ -0,0 +1,107 @@
+from core.enums import SliceType
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from bisect import bisect_left, bisect_right
+
+
+class IndexedNest(NamedTuple):
+    position: int
+    nest: dict
+    slice_type: SliceType
+    min_delay: int
+    isolation_level: str
+    max_dl_throughput: Optional[float]
+    max_ul_throughput: Optional[float]
+
+
+def get_throughput(gst: dict, section: str, key: str) -> Optional[float]:
+    value = (gst.get(section) or {}).get(key)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class NestBucket:
+    # NESTs sharing Slice Type and isolation level, with the positions of the NESTs
+    # sorted by min delay, by maximum DL throughput and by maximum UL throughput
+
+    def __init__(self, nests: List[IndexedNest]):
+        self.nests = {nest.position: nest for nest in nests}
+
+        by_delay = sorted(nests, key=lambda nest: nest.min_delay)
+        self.delays = [nest.min_delay for nest in by_delay]
+        self.by_delay = [nest.position for nest in by_delay]
+
+        by_dl = sorted([nest for nest in nests if nest.max_dl_throughput is not None],
+                       key=lambda nest: nest.max_dl_throughput)
+        self.dl_throughputs = [nest.max_dl_throughput for nest in by_dl]
+        self.by_dl = [nest.position for nest in by_dl]
+
+        by_ul = sorted([nest for nest in nests if nest.max_ul_throughput is not None],
+                       key=lambda nest: nest.max_ul_throughput)
+        self.ul_throughputs = [nest.max_ul_throughput for nest in by_ul]
+        self.by_ul = [nest.position for nest in by_ul]
+
+    def select(self, max_delay: float = None, min_dl_throughput: float = None,
+               min_ul_throughput: float = None) -> List[IndexedNest]:
+        # Each constraint is a bisect over the matching sorted list, the candidates
+        # are the intersection of the ranges, returned in catalogue order
+        ranges = []
+        if max_delay is not None:
+            ranges.append(self.by_delay[:bisect_right(self.delays, max_delay)])
+        if min_dl_throughput is not None:
+            ranges.append(self.by_dl[bisect_left(self.dl_throughputs, min_dl_throughput):])
+        if min_ul_throughput is not None:
+            ranges.append(self.by_ul[bisect_left(self.ul_throughputs, min_ul_throughput):])
+
+        if len(ranges) == 0:
+            positions = self.nests.keys()
+        else:
+            ranges.sort(key=len)
+            positions = set(ranges[0])
+            for _range in ranges[1:]:
+                positions.intersection_update(_range)
+
+        return [self.nests[position] for position in sorted(positions)]
+
+
+def build_indexed_nests(nest_slice_type_map: List[Tuple[dict, SliceType, int]]) -> List[IndexedNest]:
+    # Extract once the selection attributes of each mapped NEST, skipping the NESTs
+    # without isolation level since the selection always filters on it
+    indexed_nests = []
+    for position, (nest, slice_type, min_delay) in enumerate(nest_slice_type_map):
+        gst = nest['gst']
+        isolation_level = (gst.get('isolation') or {}).get('isolationLevel')
+        if isolation_level is None:
+            continue
+
+        indexed_nests.append(IndexedNest(
+            position, nest, slice_type, min_delay, isolation_level,
+            get_throughput(gst, 'downlinkThroughputNS', 'maximumDL'),
+            get_throughput(gst, 'uplinkThroughputNS', 'maxUplinkThroughput')
+        ))
+
+    return indexed_nests
+
+
+class NestIndex:
+    # Selection index of a catalogue version, NESTs bucketed by <Slice Type, isolation level>
+
+    def __init__(self, version, nest_slice_type_map: List[Tuple[dict, SliceType, int]]):
+        self.version = version
+
+        buckets: Dict[Tuple[SliceType, str], List[IndexedNest]] = {}
+        for indexed_nest in build_indexed_nests(nest_slice_type_map):
+            buckets.setdefault((indexed_nest.slice_type, indexed_nest.isolation_level), []).append(indexed_nest)
+
+        self.buckets = {key: NestBucket(nests) for key, nests in buckets.items()}
+
+    def select(self, slice_type: SliceType, isolation_level: str, max_delay: float = None,
+               min_dl_throughput: float = None, min_ul_throughput: float = None) -> List[IndexedNest]:
+        bucket = self.buckets.get((slice_type, isolation_level))
+        if bucket is None:
+            return []
+
+        return bucket.select(max_delay, min_dl_throughput, min_ul_throughput)
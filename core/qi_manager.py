@@ -0,0 +1,80 @@
+from core import qi, qi_watch_interval, config_path, qi_log
+from core.qi_table import QosIndicator, compile_qi
+from configparser import ConfigParser, Error
+from threading import Lock, Thread, current_thread, main_thread
+from typing import Mapping, NamedTuple
+import signal
+import time
+
+
+class QiTable(NamedTuple):
+    indicators: Mapping[str, QosIndicator]
+    version: int
+    mtime: float
+
+
+def get_config_mtime() -> float:
+    try:
+        return config_path.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+# The QI table is immutable and swapped as a whole on reload, so readers never need the lock.
+# Its version is part of the NEST selection index version: a reload invalidates the index and
+# the selection cache at the next selection
+qi_table = QiTable(qi, 0, get_config_mtime())
+qi_lock = Lock()
+
+
+def get_qi_table() -> QiTable:
+    return qi_table
+
+
+def reload_qi() -> bool:
+    # Recompile the qi section of config.ini and swap it in if it changed. On error
+    # the current table is kept, until config.ini is modified again
+    global qi_table
+    with qi_lock:
+        mtime = get_config_mtime()
+        parser = ConfigParser()
+        try:
+            if len(parser.read(config_path)) == 0:
+                raise ValueError('Cannot read ' + str(config_path))
+            if not parser.has_section('qi'):
+                raise ValueError('Section qi not found in the config.ini file')
+            indicators = compile_qi(parser.items('qi'))
+        except (Error, ValueError) as e:
+            qi_log.error('QI reload failed, still using QI table version %s: %s', qi_table.version, str(e))
+            qi_table = qi_table._replace(mtime=mtime)
+            return False
+
+        if indicators == qi_table.indicators:
+            qi_table = qi_table._replace(mtime=mtime)
+            return False
+
+        qi_table = QiTable(indicators, qi_table.version + 1, mtime)
+
+    qi_log.info('QI table reloaded, version %s with %s QIs', qi_table.version, len(indicators))
+
+    return True
+
+
+def watch_qi():
+    while True:
+        time.sleep(qi_watch_interval)
+        if get_config_mtime() != qi_table.mtime:
+            reload_qi()
+
+
+def handle_sighup(signum, frame):
+    # Signal handlers run in the main thread between two bytecodes, reload outside of it
+    Thread(target=reload_qi, daemon=True).start()
+
+
+# Signal handlers can only be installed from the main thread, and SIGHUP is not available on Windows
+if hasattr(signal, 'SIGHUP') and current_thread() is main_thread():
+    signal.signal(signal.SIGHUP, handle_sighup)
+
+if qi_watch_interval > 0:
+    Thread(target=watch_qi, daemon=True).start()
@@ -0,0 +1,24 @@
+from core.enums import SliceType
+from types import MappingProxyType
+from typing import Iterable, Mapping, NamedTuple, Tuple
+from json import loads
+
+
+class QosIndicator(NamedTuple):
+    slice_type: SliceType
+    delay: int
+    error_rate: float
+
+
+def compile_qi(params: Iterable[Tuple[str, str]]) -> Mapping[str, QosIndicator]:
+    # Parse once the entries of the qi section, e.g. qi1=["EMBB", "100", "0.01"], in a read-only
+    # QI -> <Slice Type, delay, error rate> mapping. Raise ValueError on a malformed entry
+    indicators = {}
+    for name, value in params:
+        try:
+            slice_type, delay, error_rate = loads(value)
+            indicators[name] = QosIndicator(SliceType[slice_type], int(delay), float(error_rate))
+        except (ValueError, TypeError, KeyError) as e:
+            raise ValueError('Malformed QI ' + name + ' in qi section of config.ini file: ' + str(e))
+
+    return MappingProxyType(indicators)
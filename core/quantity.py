@@ -0,0 +1,68 @@
+from core import exceptions
+from fractions import Fraction
+from functools import lru_cache
+from math import ceil
+import re
+
+# K8s quantity: a decimal number followed by a binary (Ki, Mi, ...) or decimal (m, k, M, ...) suffix, or an exponent
+quantity_pattern = re.compile(r'^([+]?(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+))'
+                              r'(?:[eE]([+-]?[0-9]+)|(Ki|Mi|Gi|Ti|Pi|Ei|n|u|m|k|M|G|T|P|E))?$')
+
+binary_suffixes = [('Ei', 2 ** 60), ('Pi', 2 ** 50), ('Ti', 2 ** 40), ('Gi', 2 ** 30), ('Mi', 2 ** 20), ('Ki', 2 ** 10)]
+decimal_suffixes = [('E', 10 ** 18), ('P', 10 ** 15), ('T', 10 ** 12), ('G', 10 ** 9), ('M', 10 ** 6), ('k', 10 ** 3)]
+
+multipliers = dict(binary_suffixes + decimal_suffixes, n=Fraction(1, 10 ** 9), u=Fraction(1, 10 ** 6),
+                   m=Fraction(1, 10 ** 3))
+
+# Bounds on the input, as K8s does: the exponent keeps within the range of the suffixes, the length bounds
+# the digits of the number. Parsing is otherwise unbounded in time and memory, and the results are cached
+max_exponent = 18
+max_quantity_length = 64
+
+
+@lru_cache(maxsize=4096)
+def parse_quantity(quantity: str) -> Fraction:
+    # Parse a K8s quantity, e.g. 500m, 1.5Gi or 1e3, in its exact value in base units
+    match = quantity_pattern.match(quantity) if len(quantity) <= max_quantity_length else None
+    if match is None:
+        raise exceptions.QuantitiesMalformedException('Malformed quantity ' + quantity)
+
+    number, exponent, suffix = match.groups()
+    value = Fraction(number)
+    if exponent is not None:
+        if abs(int(exponent)) > max_exponent:
+            raise exceptions.QuantitiesMalformedException('Out of range exponent in quantity ' + quantity)
+        value *= Fraction(10) ** int(exponent)
+    elif suffix is not None:
+        value *= multipliers[suffix]
+
+    return value
+
+
+def parse_cpu(quantity: str) -> int:
+    # CPU quantity in milli-CPUs, rounded up as K8s does
+    return ceil(parse_quantity(str(quantity)) * 1000)
+
+
+def parse_bytes(quantity: str) -> int:
+    # Memory or storage quantity in bytes, rounded up as K8s does
+    return ceil(parse_quantity(str(quantity)))
+
+
+def format_cpu(millis: int) -> str:
+    if millis % 1000 == 0:
+        return str(millis // 1000)
+
+    return str(millis) + 'm'
+
+
+def format_bytes(value: int) -> str:
+    # Use the largest binary suffix dividing the value exactly, then the largest decimal one
+    if value == 0:
+        return '0'
+
+    for suffix, multiplier in binary_suffixes + decimal_suffixes:
+        if value % multiplier == 0:
+            return str(value // multiplier) + suffix
+
+    return str(value)
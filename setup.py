@@ -4,4 +4,9 @@ setup(
     name='app-aware-nsm',
     packages=['apis', 'core'],
     include_package_data=True,
-    install_requires=['flask', 'flask-restx'])
+    package_data={'core': ['migrations/*.sql']},
+    entry_points={
+        'console_scripts': ['app-aware-nsm-migrate=core.migration_manager:main']
+    },
+    install_requires=['flask', 'flask-restx'],
+    extras_require={'numpy': ['numpy']})
@@ -0,0 +1,75 @@
+#
+# Unit tests of the K8s quantity parsing and formatting, run from the repository root:
+#   python3 -m unittest discover tests
+#
+from core.exceptions import QuantitiesMalformedException
+from core.quantity import parse_quantity, parse_cpu, parse_bytes, format_cpu, format_bytes
+from fractions import Fraction
+import unittest
+
+
+class ParseQuantityTest(unittest.TestCase):
+
+    def test_suffixes(self):
+        self.assertEqual(parse_quantity('500m'), Fraction(1, 2))
+        self.assertEqual(parse_quantity('1Gi'), 2 ** 30)
+        self.assertEqual(parse_quantity('512Mi'), 2 ** 29)
+        self.assertEqual(parse_quantity('2k'), 2000)
+        self.assertEqual(parse_quantity('100n'), Fraction(1, 10 ** 7))
+
+    def test_fractional_values(self):
+        self.assertEqual(parse_quantity('1.5Gi'), 3 * 2 ** 29)
+        self.assertEqual(parse_quantity('.5'), Fraction(1, 2))
+        self.assertEqual(parse_quantity('0.1'), Fraction(1, 10))
+        self.assertEqual(parse_quantity('+2.'), 2)
+
+    def test_exponents(self):
+        self.assertEqual(parse_quantity('1e3'), 1000)
+        self.assertEqual(parse_quantity('15E-1'), Fraction(3, 2))
+        self.assertEqual(parse_quantity('1e18'), 10 ** 18)
+        self.assertEqual(parse_quantity('1e-18'), Fraction(1, 10 ** 18))
+
+    def test_out_of_range_exponents(self):
+        for quantity in ['1e19', '1e-19', '1e999999999']:
+            with self.assertRaises(QuantitiesMalformedException):
+                parse_quantity(quantity)
+
+    def test_malformed(self):
+        for quantity in ['', 'abc', '-1', '1.2.3', '1 Gi', '1gi', '1Gi1', 'e3', '1e', '1' * 65]:
+            with self.assertRaises(QuantitiesMalformedException):
+                parse_quantity(quantity)
+
+
+class ParseCpuBytesTest(unittest.TestCase):
+
+    def test_parse_cpu(self):
+        self.assertEqual(parse_cpu('500m'), 500)
+        self.assertEqual(parse_cpu('2'), 2000)
+        self.assertEqual(parse_cpu('0.0001'), 1)
+        self.assertEqual(parse_cpu(1), 1000)
+
+    def test_parse_bytes(self):
+        self.assertEqual(parse_bytes('1Gi'), 2 ** 30)
+        self.assertEqual(parse_bytes('1.5k'), 1500)
+        self.assertEqual(parse_bytes('0.5'), 1)
+
+
+class FormatTest(unittest.TestCase):
+
+    def test_format_cpu(self):
+        self.assertEqual(format_cpu(500), '500m')
+        self.assertEqual(format_cpu(2000), '2')
+        # 500m + 1
+        self.assertEqual(format_cpu(parse_cpu('500m') + parse_cpu('1')), '1500m')
+
+    def test_format_bytes(self):
+        self.assertEqual(format_bytes(0), '0')
+        self.assertEqual(format_bytes(2 ** 30), '1Gi')
+        self.assertEqual(format_bytes(5 * 10 ** 8), '500M')
+        self.assertEqual(format_bytes(1001), '1001')
+        # 1Gi + 512Mi
+        self.assertEqual(format_bytes(parse_bytes('1Gi') + parse_bytes('512Mi')), '1536Mi')
+
+
+if __name__ == '__main__':
+    unittest.main()